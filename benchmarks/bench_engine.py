@@ -0,0 +1,57 @@
+"""Benchmark of the per bar overhead of the backtest loop.
+
+Compares iterating over the quotes records (how `AbstractStrategy.start`
+used to pass bars to `handle`) with `iter_bars`. The handler only reads
+a few fields of the bar, so the time is mostly the loop overhead.
+
+Usage: python benchmarks/bench_engine.py [bars]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from quantdom.lib.base import BaseQuotes
+from quantdom.lib.engine import iter_bars
+
+
+def make_quotes(bars):
+    quotes = BaseQuotes(shape=(bars,))
+    price = 100 + np.cumsum(np.random.standard_normal(bars)) * 0.01
+    quotes.id = np.arange(bars)
+    quotes.time = np.arange(bars) * 60.0
+    quotes.open = price
+    quotes.high = price + 0.05
+    quotes.low = price - 0.05
+    quotes.close = price + 0.01
+    quotes.volume = np.random.randint(1, 1000, bars)
+    return quotes
+
+
+def handle(quote):
+    return quote.close > quote.open and quote.high - quote.low > 0.01
+
+
+def run(bars):
+    for bar in bars:
+        handle(bar)
+
+
+def main(bars=1_000_000, repeat=3):
+    quotes = make_quotes(bars)
+    for name, get_bars in (
+        ('records', lambda: quotes),
+        ('iter_bars', lambda: iter_bars(quotes)),
+    ):
+        timings = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            run(get_bars())
+            timings.append(time.perf_counter() - t)
+        best = min(timings)
+        print('%-10s %.3f sec per 1M bars' % (name, best / bars * 10 ** 6))
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
@@ -0,0 +1,46 @@
+"""Benchmark of loading quotes from a DataFrame into `BaseQuotes`.
+
+Usage: python benchmarks/bench_ingest.py [rows]
+"""
+
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from quantdom.lib.base import BaseQuotes
+
+
+def make_frame(rows):
+    index = pd.date_range('2000-01-01', periods=rows, freq='min', name='Date')
+    price = 100 + np.cumsum(np.random.standard_normal(rows)) * 0.01
+    return pd.DataFrame(
+        {
+            'Open': price,
+            'High': price + 0.05,
+            'Low': price - 0.05,
+            'Close': price + 0.01,
+            'Volume': np.random.randint(1, 1000, rows),
+        },
+        index=index,
+    )
+
+
+def main(rows=2_000_000, repeat=5):
+    data = make_frame(rows)
+    quotes = BaseQuotes()
+    timings = []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        quotes.new(data, default_tf=1)
+        timings.append(time.perf_counter() - t)
+    best = min(timings)
+    print(
+        'BaseQuotes.new: %d rows in %.3f sec (%.2fM rows/sec)'
+        % (rows, best, rows / best / 10 ** 6)
+    )
+
+
+if __name__ == '__main__':
+    main(*map(int, sys.argv[1:]))
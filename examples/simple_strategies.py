@@ -1,4 +1,14 @@
-from quantdom import AbstractStrategy, Order, Portfolio
+import numpy as np
+
+from quantdom import (
+    SMA,
+    AbstractStrategy,
+    CompiledStrategy,
+    IndicatorCache,
+    Order,
+    Portfolio,
+    VectorizedStrategy,
+)
 
 
 class ThreeBarStrategy(AbstractStrategy):
@@ -20,12 +30,16 @@ class ThreeBarStrategy(AbstractStrategy):
                 'price': quote.open,
                 'volume': self.volume,
                 'time': quote.time,
+                'id_bar': quote.id,
             }
             if not self.last_position:
                 self.last_position = Order.open(**props)
             elif self.last_position.type != self.signal:
                 Order.close(
-                    self.last_position, price=quote.open, time=quote.time
+                    self.last_position,
+                    price=quote.open,
+                    time=quote.time,
+                    id_bar=quote.id,
                 )
                 self.last_position = Order.open(**props)
             self.signal = False
@@ -42,3 +56,52 @@ class ThreeBarStrategy(AbstractStrategy):
             self.signal = Order.BUY
         elif self.seq_low_bars == self.low_bars:
             self.signal = Order.SELL
+
+
+class CompiledThreeBarStrategy(CompiledStrategy):
+    """ThreeBarStrategy with the bar logic compiled by numba."""
+
+    volume = 100  # shares
+
+    def init(self, high_bars=3, low_bars=3):
+        Portfolio.initial_balance = 100_000  # default value
+        self.kernel_args = (high_bars, low_bars)
+
+    @staticmethod
+    def kernel(signals, time, open, high, low, close, volume, *args):
+        high_bars, low_bars = args
+        seq_high_bars = seq_low_bars = signal = 0
+        for i in range(len(close)):
+            if signal:
+                # the order is executed on this bar
+                signal = 0
+                seq_high_bars = seq_low_bars = 0
+
+            if close[i] > open[i]:
+                seq_high_bars += 1
+                seq_low_bars = 0
+            else:
+                seq_high_bars = 0
+                seq_low_bars += 1
+
+            if seq_high_bars == high_bars:
+                signal = 1
+            elif seq_low_bars == low_bars:
+                signal = -1
+            signals[i] = signal
+
+
+class MovingAverageCrossStrategy(VectorizedStrategy):
+    volume = 100  # shares
+
+    def init(self, fast=10, slow=30):
+        Portfolio.initial_balance = 100_000  # default value
+        # values are shared between the variants of an optimization
+        fast_ma = IndicatorCache.get(self.quotes, SMA, fast)
+        slow_ma = IndicatorCache.get(self.quotes, SMA, slow)
+        above = fast_ma > slow_ma
+        # a crossover - the fast MA is above the slow one, but wasn't before
+        crossed = above[1:] != above[:-1]
+        crossed &= ~np.isnan(slow_ma[:-1])
+        self.long_entries = np.append(False, crossed & above[1:])
+        self.short_entries = np.append(False, crossed & ~above[1:])
@@ -3,11 +3,21 @@
 from .base import *  # noqa
 from .charts import *  # noqa
 from .const import *  # noqa
+from .context import *  # noqa
+from .engine import *  # noqa
+from .indicators import *  # noqa
 from .loaders import *  # noqa
+from .optimization import *  # noqa
+from .orders import *  # noqa
 from .performance import *  # noqa
 from .portfolio import *  # noqa
+from .runner import *  # noqa
+from .storage import *  # noqa
+from .store import *  # noqa
 from .strategy import *  # noqa
 from .tables import *  # noqa
+from .ticks import *  # noqa
+from .timeframes import *  # noqa
 from .utils import *  # noqa
 
 import warnings
@@ -20,10 +30,20 @@ __all__ = (
     base.__all__  # noqa
     + charts.__all__  # noqa
     + const.__all__  # noqa
+    + context.__all__  # noqa
+    + engine.__all__  # noqa
+    + indicators.__all__  # noqa
     + loaders.__all__  # noqa
+    + optimization.__all__  # noqa
+    + orders.__all__  # noqa
     + performance.__all__  # noqa
     + portfolio.__all__  # noqa
+    + runner.__all__  # noqa
+    + storage.__all__  # noqa
+    + store.__all__  # noqa
     + strategy.__all__  # noqa
     + tables.__all__  # noqa
+    + ticks.__all__  # noqa
+    + timeframes.__all__  # noqa
     + utils.__all__  # noqa
 )
@@ -7,7 +7,7 @@ import pandas as pd
 
 from .const import ChartType, TimeFrame
 
-__all__ = ('Indicator', 'Symbol', 'Quotes')
+__all__ = ('Indicator', 'Symbol', 'Quotes', 'QuotesBuffer')
 
 
 class BaseQuotes(np.recarray):
@@ -26,6 +26,11 @@ class BaseQuotes(np.recarray):
         shape = shape or (1,)
         return np.ndarray.__new__(cls, shape, (np.record, dt), order=order)
 
+    def __array_finalize__(self, obj):
+        super().__array_finalize__(obj)
+        # slices and copies keep the timeframe of the original quotes
+        self.timeframe = getattr(obj, 'timeframe', None)
+
     def _nan_to_closest_num(self):
         """Return interpolated values instead of NaN."""
         for col in ['open', 'high', 'low', 'close']:
@@ -46,38 +51,139 @@ class BaseQuotes(np.recarray):
             240: TimeFrame.H4,
             1440: TimeFrame.D1,
         }
+        if len(self) < 2:
+            self.timeframe = tf.get(default_tf)
+            return
         minutes = int(np.diff(self.time[-10:]).min() / 60)
         self.timeframe = tf.get(minutes) or tf[default_tf]
 
     def new(self, data, source=None, default_tf=None):
-        shape = (len(data),)
+        if isinstance(data, pd.DataFrame):
+            data = self._frame_to_columns(data)
+        shape = (len(data['time'] if isinstance(data, dict) else data),)
         self.resize(shape, refcheck=False)
 
-        if isinstance(data, pd.DataFrame):
-            data.reset_index(inplace=True)
-            data.insert(0, 'id', data.index)
-            data.Date = self.convert_dates(data.Date)
-            data = data.rename(
-                columns={
-                    'Date': 'time',
-                    'Open': 'open',
-                    'High': 'high',
-                    'Low': 'low',
-                    'Close': 'close',
-                    'Volume': 'volume',
-                }
-            )
-            for name in self.dtype.names:
-                self[name] = data[name]
-        elif isinstance(data, (np.recarray, BaseQuotes)):
+        if isinstance(data, (np.recarray, BaseQuotes)):
             self[:] = data[:]
+        elif isinstance(data, dict):
+            # columns (e.g. memory-mapped from a quotes file)
+            for name in self.dtype.names:
+                self[name] = data[name] if name in data else np.arange(*shape)
 
         self._nan_to_closest_num()
-        self._set_time_frame(default_tf)
+        if getattr(data, 'timeframe', None):
+            self.timeframe = data.timeframe
+        else:
+            self._set_time_frame(default_tf)
         return self
 
-    def convert_dates(self, dates):
-        return np.array([d.timestamp() for d in dates])
+    def bar_index(self, time, id_bar=None):
+        """Return the index of the bar with the time.
+
+        If `id_bar` (e.g. `id` of the bar) is passed and it's the index
+        of the bar with the time, it's returned as is, otherwise the bar
+        is searched by the (sorted) time in O(log N).
+        """
+        times = self.time
+        if id_bar is not None and 0 <= id_bar < len(times):
+            if times[id_bar] == time:
+                return id_bar
+        index = int(np.searchsorted(times, time))
+        if index == len(times) or times[index] != time:
+            raise ValueError('There is no bar with time %s' % time)
+        return index
+
+    def chunks(self, size):
+        """Yield consecutive chunks (views) of the quotes."""
+        for start in range(0, len(self), size):
+            yield self[start : start + size]
+
+    def _frame_to_columns(self, data):
+        """Return columns of the frame without copying or changing it."""
+        columns = {
+            'Open': 'open',
+            'High': 'high',
+            'Low': 'low',
+            'Close': 'close',
+            'Volume': 'volume',
+        }
+        dates = data['Date'] if 'Date' in data.columns else data.index
+        result = {'time': self.convert_dates(dates)}
+        for col, name in columns.items():
+            result[name] = data[col].values
+        return result
+
+    @staticmethod
+    def convert_dates(dates):
+        """Return timestamps (in seconds) of the dates."""
+        # tz-aware dates are converted to UTC, naive ones are treated as UTC
+        dates = pd.DatetimeIndex(dates).values
+        nanoseconds = dates.astype('datetime64[ns]', copy=False).view('i8')
+        return np.true_divide(nanoseconds, 10 ** 9)
+
+
+class QuotesBuffer:
+    """Growable quotes for appending bars (e.g. from a live feed).
+
+    Bars are stored in a preallocated array, that grows by `growth_factor`
+    when it's full, so appending a bar takes O(1) amortized time.
+    `quotes` is a contiguous view of the appended bars. Note that after
+    the buffer grows, the views taken before don't see the new bars.
+    """
+
+    growth_factor = 2
+
+    def __init__(self, quotes=None, capacity=1024, timeframe=None):
+        size = len(quotes) if quotes is not None else 0
+        self._data = BaseQuotes(shape=(max(capacity, size, 1),))
+        self._size = 0
+        self.timeframe = getattr(quotes, 'timeframe', None) or timeframe
+        if size:
+            self.extend(quotes)
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    @property
+    def quotes(self):
+        quotes = self._data[: self._size]
+        quotes.timeframe = self.timeframe
+        return quotes
+
+    def _reserve(self, size):
+        if size <= len(self._data):
+            return
+        capacity = max(size, int(len(self._data) * self.growth_factor))
+        data = BaseQuotes(shape=(capacity,))
+        data[: self._size] = self._data[: self._size]
+        self._data = data
+
+    def append(self, time, open, high, low, close, volume=0):
+        """Append one bar."""
+        i = self._size
+        if i == len(self._data):
+            self._reserve(i + 1)
+        self._data[i] = (i, time, open, high, low, close, volume)
+        self._size += 1
+
+    def extend(self, bars):
+        """Append bars (quotes, a record array or a dict of columns)."""
+        size = len(bars['time'])
+        if not size:
+            return
+        start, end = self._size, self._size + size
+        self._reserve(end)
+        chunk = self._data[start:end]
+        for name in self._data.dtype.names:
+            if name == 'id':
+                chunk.id = np.arange(start, end)
+            else:
+                chunk[name] = bars[name]
+        self._size = end
 
 
 class SymbolType(Enum):
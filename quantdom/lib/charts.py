@@ -4,8 +4,8 @@ import numpy as np
 import pyqtgraph as pg
 from PyQt5 import QtCore, QtGui
 
-from .base import Quotes
 from .const import ChartType
+from .indicators import BaseIndicator
 from .portfolio import Order, Portfolio
 from .utils import fromtimestamp, timeit
 
@@ -65,9 +65,10 @@ class PriceAxis(pg.AxisItem):
 class DateAxis(pg.AxisItem):
     tick_tpl = {'D1': '%d %b\n%Y'}
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, quotes, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.quotes_count = len(Quotes) - 1
+        self.quotes = quotes
+        self.quotes_count = len(quotes) - 1
 
     def tickStrings(self, values, scale, spacing):
         s_period = 'D1'
@@ -75,7 +76,7 @@ class DateAxis(pg.AxisItem):
         for ibar in values:
             if ibar > self.quotes_count:
                 return strings
-            dt_tick = fromtimestamp(Quotes[int(ibar)].time)
+            dt_tick = fromtimestamp(self.quotes[int(ibar)].time)
             strings.append(dt_tick.strftime(self.tick_tpl[s_period]))
         return strings
 
@@ -130,7 +131,6 @@ class AxisLabel(pg.GraphicsObject):
         self.opacity = opacity
         self.label_str = ''
         self.digits = digits
-        self.quotes_count = len(Quotes) - 1
         if isinstance(color, QtGui.QPen):
             self.bg_color = color.color()
             self.fg_color = pg.mkColor('#ffffff')
@@ -181,14 +181,15 @@ class XAxisLabel(AxisLabel):
     def tick_to_string(self, tick_pos):
         # TODO: change to actual period
         tpl = self.parent.tick_tpl['D1']
-        return fromtimestamp(Quotes[round(tick_pos)].time).strftime(tpl)
+        quotes = self.parent.quotes
+        return fromtimestamp(quotes[round(tick_pos)].time).strftime(tpl)
 
     def boundingRect(self):  # noqa
         return QtCore.QRectF(0, 0, 60, 38)
 
     def update_label(self, evt_post, point_view):
         ibar = point_view.x()
-        if ibar > self.quotes_count:
+        if ibar > self.parent.quotes_count:
             return
         self.label_str = self.tick_to_string(ibar)
         width = self.boundingRect().width()
@@ -350,26 +351,28 @@ class BarItem(pg.GraphicsObject):
     bull_brush = pg.mkBrush('#00cc00')
     bear_brush = pg.mkBrush('#fa0000')
 
-    def __init__(self):
+    def __init__(self, quotes):
         super().__init__()
+        self.quotes = quotes
         self.generatePicture()
 
     def _generate(self, p):
+        quotes = self.quotes
         hl = np.array(
-            [QtCore.QLineF(q.id, q.low, q.id, q.high) for q in Quotes]
+            [QtCore.QLineF(q.id, q.low, q.id, q.high) for q in quotes]
         )
         op = np.array(
-            [QtCore.QLineF(q.id - self.w, q.open, q.id, q.open) for q in Quotes]
+            [QtCore.QLineF(q.id - self.w, q.open, q.id, q.open) for q in quotes]
         )
         cl = np.array(
             [
                 QtCore.QLineF(q.id + self.w, q.close, q.id, q.close)
-                for q in Quotes
+                for q in quotes
             ]
         )
         lines = np.concatenate([hl, op, cl])
-        long_bars = np.resize(Quotes.close > Quotes.open, len(lines))
-        short_bars = np.resize(Quotes.close < Quotes.open, len(lines))
+        long_bars = np.resize(quotes.close > quotes.open, len(lines))
+        short_bars = np.resize(quotes.close < quotes.open, len(lines))
 
         p.setPen(self.bull_brush)
         p.drawLines(*lines[long_bars])
@@ -399,21 +402,22 @@ class CandlestickItem(BarItem):
     bear_brush = pg.mkBrush('#ff0000')
 
     def _generate(self, p):
+        quotes = self.quotes
         rects = np.array(
             [
                 QtCore.QRectF(q.id - self.w, q.open, self.w2, q.close - q.open)
-                for q in Quotes
+                for q in quotes
             ]
         )
 
         p.setPen(self.line_pen)
-        p.drawLines([QtCore.QLineF(q.id, q.low, q.id, q.high) for q in Quotes])
+        p.drawLines([QtCore.QLineF(q.id, q.low, q.id, q.high) for q in quotes])
 
         p.setBrush(self.bull_brush)
-        p.drawRects(*rects[Quotes.close > Quotes.open])
+        p.drawRects(*rects[quotes.close > quotes.open])
 
         p.setBrush(self.bear_brush)
-        p.drawRects(*rects[Quotes.close < Quotes.open])
+        p.drawRects(*rects[quotes.close < quotes.open])
 
 
 class QuotesChart(QtGui.QWidget):
@@ -423,6 +427,9 @@ class QuotesChart(QtGui.QWidget):
     short_pen = pg.mkPen('#600000')
     short_brush = pg.mkBrush('#ff0000')
 
+    # pens of the lines of an indicator
+    indicator_pens = ('b', 'r', 'g')
+
     zoomIsDisabled = QtCore.pyqtSignal(bool)
 
     def __init__(self):
@@ -431,14 +438,6 @@ class QuotesChart(QtGui.QWidget):
         self.style = ChartType.CANDLESTICK
         self.indicators = []
 
-        self.xaxis = DateAxis(orientation='bottom')
-        self.xaxis.setStyle(
-            tickTextOffset=7, textFillLimits=[(0, 0.80)], showValues=False
-        )
-
-        self.xaxis_ind = DateAxis(orientation='bottom')
-        self.xaxis_ind.setStyle(tickTextOffset=7, textFillLimits=[(0, 0.80)])
-
         self.layout = QtGui.QVBoxLayout(self)
         self.layout.setContentsMargins(0, 0, 0, 0)
 
@@ -471,36 +470,46 @@ class QuotesChart(QtGui.QWidget):
     def _update_quotes_chart(self):
         self.chart.hideAxis('left')
         self.chart.showAxis('right')
-        self.chart.addItem(_get_chart_points(self.style))
+        self.chart.addItem(_get_chart_points(self.style, self.quotes))
         self.chart.setLimits(
-            xMin=Quotes[0].id,
-            xMax=Quotes[-1].id,
+            xMin=self.quotes[0].id,
+            xMax=self.quotes[-1].id,
             minXRange=60,
-            yMin=Quotes.low.min() * 0.98,
-            yMax=Quotes.high.max() * 1.02,
+            yMin=self.quotes.low.min() * 0.98,
+            yMax=self.quotes.high.max() * 1.02,
         )
         self.chart.showGrid(x=True, y=True)
         self.chart.setCursor(QtCore.Qt.BlankCursor)
         self.chart.sigXRangeChanged.connect(self._update_yrange_limits)
 
     def _update_ind_charts(self):
-        for ind, d in self.indicators:
-            curve = pg.PlotDataItem(d, pen='b', antialias=True)
-            ind.addItem(curve)
+        for ind, lines in self.indicators:
+            for d, pen in zip(lines, self.indicator_pens):
+                curve = pg.PlotDataItem(
+                    d, pen=pen, antialias=True, connect='finite'
+                )
+                ind.addItem(curve)
             ind.hideAxis('left')
             ind.showAxis('right')
             # ind.setAspectLocked(1)
             ind.setXLink(self.chart)
+            ydata = np.concatenate(lines)
             ind.setLimits(
-                xMin=Quotes[0].id,
-                xMax=Quotes[-1].id,
+                xMin=self.quotes[0].id,
+                xMax=self.quotes[-1].id,
                 minXRange=60,
-                yMin=Quotes.open.min() * 0.98,
-                yMax=Quotes.open.max() * 1.02,
+                yMin=np.nanmin(ydata) * 0.98,
+                yMax=np.nanmax(ydata) * 1.02,
             )
             ind.showGrid(x=True, y=True)
             ind.setCursor(QtCore.Qt.BlankCursor)
 
+    def _indicator_lines(self, indicator):
+        if not isinstance(indicator, BaseIndicator):
+            return [np.asarray(indicator, dtype=float)]
+        values = indicator.calculate_quotes(self.quotes)
+        return [values] if indicator.lines is None else list(values)
+
     def _update_sizes(self):
         min_h_ind = int(self.height() * 0.3 / len(self.indicators))
         sizes = [int(self.height() * 0.7)]
@@ -512,24 +521,42 @@ class QuotesChart(QtGui.QWidget):
         lbar, rbar = int(vr.left()), int(vr.right())
         if self.signals_visible:
             self._show_text_signals(lbar, rbar)
-        bars = Quotes[lbar:rbar]
+        bars = self.quotes[lbar:rbar]
         ylow = bars.low.min() * 0.98
         yhigh = bars.high.max() * 1.02
 
         std = np.std(bars.close)
         self.chart.setLimits(yMin=ylow, yMax=yhigh, minYRange=std)
         self.chart.setYRange(ylow, yhigh)
-        for i, d in self.indicators:
+        for i, lines in self.indicators:
             # ydata = i.plotItem.items[0].getData()[1]
-            ydata = d[lbar:rbar]
-            ylow = ydata.min() * 0.98
-            yhigh = ydata.max() * 1.02
-            std = np.std(ydata)
+            ydata = np.concatenate([d[lbar:rbar] for d in lines])
+            if np.isnan(ydata).all():
+                # e.g. the period of a moving average isn't reached yet
+                continue
+            ylow = np.nanmin(ydata) * 0.98
+            yhigh = np.nanmax(ydata) * 1.02
+            std = np.nanstd(ydata)
             i.setLimits(yMin=ylow, yMax=yhigh, minYRange=std)
             i.setYRange(ylow, yhigh)
 
-    def plot(self, symbol):
+    def plot(self, symbol, indicators=None):
+        """Plot quotes of the symbol and the indicators below them.
+
+        * indicators - indicators (see `.indicators`) or arrays of values,
+          each one is plotted in its own pane.
+        """
         self.digits = symbol.digits
+        self.quotes = Portfolio.get_quotes(symbol)
+
+        self.xaxis = DateAxis(self.quotes, orientation='bottom')
+        self.xaxis.setStyle(
+            tickTextOffset=7, textFillLimits=[(0, 0.80)], showValues=False
+        )
+
+        self.xaxis_ind = DateAxis(self.quotes, orientation='bottom')
+        self.xaxis_ind.setStyle(tickTextOffset=7, textFillLimits=[(0, 0.80)])
+
         self.chart = CustomPlotWidget(
             parent=self.splitter,
             axisItems={'bottom': self.xaxis, 'right': PriceAxis()},
@@ -538,9 +565,10 @@ class QuotesChart(QtGui.QWidget):
         self.chart.getPlotItem().setContentsMargins(*CHART_MARGINS)
         self.chart.setFrameStyle(QtGui.QFrame.StyledPanel | QtGui.QFrame.Plain)
 
-        inds = [Quotes.open]
+        if indicators is None:
+            indicators = [self.quotes.open]
 
-        for d in inds:
+        for indicator in indicators:
             ind = CustomPlotWidget(
                 parent=self.splitter,
                 axisItems={'bottom': self.xaxis_ind, 'right': PriceAxis()},
@@ -549,7 +577,7 @@ class QuotesChart(QtGui.QWidget):
             ind.setFrameStyle(QtGui.QFrame.StyledPanel | QtGui.QFrame.Plain)
             ind.getPlotItem().setContentsMargins(*CHART_MARGINS)
             # self.splitter.addWidget(ind)
-            self.indicators.append((ind, d))
+            self.indicators.append((ind, self._indicator_lines(indicator)))
 
         self._update_quotes_chart()
         self._update_ind_charts()
@@ -563,12 +591,12 @@ class QuotesChart(QtGui.QWidget):
     def add_signals(self):
         self.signals_group_text = QtGui.QGraphicsItemGroup()
         self.signals_group_arrow = QtGui.QGraphicsItemGroup()
-        self.signals_text_items = np.empty(len(Quotes), dtype=object)
+        self.signals_text_items = np.empty(len(self.quotes), dtype=object)
 
         for p in Portfolio.positions:
             x, price = p.id_bar_open, p.open_price
             if p.type == Order.BUY:
-                y = Quotes[x].low * 0.99
+                y = self.quotes[x].low * 0.99
                 pg.ArrowItem(
                     parent=self.signals_group_arrow,
                     pos=(x, y),
@@ -588,7 +616,7 @@ class QuotesChart(QtGui.QWidget):
                 )
                 text_sig.hide()
             else:
-                y = Quotes[x].high * 1.01
+                y = self.quotes[x].high * 1.01
                 pg.ArrowItem(
                     parent=self.signals_group_arrow,
                     pos=(x, y),
@@ -627,7 +655,8 @@ class EquityChart(QtGui.QWidget):
 
     def __init__(self):
         super().__init__()
-        self.xaxis = DateAxis(orientation='bottom')
+        self.quotes = Portfolio.quotes
+        self.xaxis = DateAxis(self.quotes, orientation='bottom')
         self.xaxis.setStyle(tickTextOffset=7, textFillLimits=[(0, 0.80)])
         self.yaxis = PriceAxis()
 
@@ -772,8 +801,8 @@ class EquityChart(QtGui.QWidget):
         _max = np_arrs.max() * 1.1
 
         self.chart.setLimits(
-            xMin=Quotes[0].id,
-            xMax=Quotes[-1].id,
+            xMin=self.quotes[0].id,
+            xMax=self.quotes[-1].id,
             yMin=_min,
             yMax=_max,
             minXRange=60,
@@ -786,9 +815,9 @@ class EquityChart(QtGui.QWidget):
             self.max_curve = np.maximum(self.max_curve, arr)
 
 
-def _get_chart_points(style):
+def _get_chart_points(style, quotes):
     if style == ChartType.CANDLESTICK:
-        return CandlestickItem()
+        return CandlestickItem(quotes)
     elif style == ChartType.BAR:
-        return BarItem()
-    return pg.PlotDataItem(Quotes.close, pen='b')
+        return BarItem(quotes)
+    return pg.PlotDataItem(quotes.close, pen='b')
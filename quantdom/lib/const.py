@@ -2,7 +2,7 @@
 
 from enum import Enum, auto
 
-__all__ = ('ChartType', 'TimeFrame')
+__all__ = ('ChartType', 'TimeFrame', 'TIMEFRAME_SECONDS')
 
 
 class ChartType(Enum):
@@ -23,6 +23,20 @@ class TimeFrame(Enum):
     MN = auto()
 
 
+# duration of a bar (the duration of a month bar depends on a month)
+TIMEFRAME_SECONDS = {
+    TimeFrame.M1: 60,
+    TimeFrame.M5: 5 * 60,
+    TimeFrame.M15: 15 * 60,
+    TimeFrame.M30: 30 * 60,
+    TimeFrame.H1: 60 * 60,
+    TimeFrame.H4: 4 * 60 * 60,
+    TimeFrame.D1: 24 * 60 * 60,
+    TimeFrame.W1: 7 * 24 * 60 * 60,
+    TimeFrame.MN: None,
+}
+
+
 ANNUAL_PERIOD = 252  # number of trading days in a year
 
 # # TODO: 6.5 - US trading hours (trading session); fix it for fx
@@ -0,0 +1,65 @@
+"""Context of a backtest."""
+
+from contextlib import contextmanager
+
+from .orders import BaseOrderBook, OrderBook
+from .portfolio import BasePortfolio, Portfolio
+
+__all__ = ('DefaultContext', 'RunContext')
+
+
+class RunContext:
+    """Portfolio (with its quotes store) and order book of a backtest.
+
+    A strategy trades in the context passed to it. While the context is
+    active (see `activate`), the global `Portfolio` and `OrderBook` refer
+    to its portfolio and order book in the current thread, so the code
+    using them (e.g. `Order.open`, `Position.close`) needs no changes.
+    Backtests in different contexts don't affect each other, so they can
+    be run at the same time in threads. The global objects make up
+    the `DefaultContext`.
+    """
+
+    def __init__(self, portfolio=None, orders=None, store=None):
+        if portfolio is None:
+            portfolio = BasePortfolio(store=store)
+        self.portfolio = portfolio
+        self.orders = BaseOrderBook() if orders is None else orders
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self.portfolio)
+
+    @property
+    def store(self):
+        return self.portfolio.store
+
+    def clone(self, balance=None):
+        """Return a new context with the same settings and quotes."""
+        portfolio = BasePortfolio(
+            balance=(
+                self.portfolio.initial_balance if balance is None else balance
+            ),
+            leverage=self.portfolio.leverage,
+            store=self.store,
+        )
+        portfolio.timeframe = self.portfolio.timeframe
+        return self.__class__(portfolio)
+
+    def set_current(self):
+        """Activate the context, return the previous (portfolio, orders)."""
+        return (
+            Portfolio.set_current(self.portfolio),
+            OrderBook.set_current(self.orders),
+        )
+
+    @contextmanager
+    def activate(self):
+        previous = self.set_current()
+        try:
+            yield self
+        finally:
+            Portfolio.set_current(previous[0])
+            OrderBook.set_current(previous[1])
+
+
+DefaultContext = RunContext(Portfolio.default, OrderBook.default)
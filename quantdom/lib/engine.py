@@ -0,0 +1,337 @@
+"""Execution engine."""
+
+import logging
+
+import numpy as np
+
+from .portfolio import Order, Portfolio, Position
+from .timeframes import completed_bars
+
+try:
+    import numba
+    from numba.core.errors import NumbaError
+except ImportError:
+    numba = None
+
+__all__ = (
+    'AlignedBar',
+    'Bar',
+    'BarSlice',
+    'HigherTimeframe',
+    'execute_signals',
+    'iter_bar_slices',
+    'iter_bars',
+    'run_kernel',
+    'signals_to_positions',
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+FIELDS = ('id', 'time', 'open', 'high', 'low', 'close', 'volume')
+
+
+class Bar:
+    """A bar passed to `AbstractStrategy.handle`.
+
+    Fields are plain python numbers, so accessing them is much cheaper
+    than accessing fields of a quotes record. Note that the same object
+    is reused for all bars of a backtest, so use `copy` to keep a bar.
+    """
+
+    __slots__ = FIELDS
+
+    def __getitem__(self, key):
+        # supports access by name and index like a quotes record does
+        return getattr(self, FIELDS[key] if isinstance(key, int) else key)
+
+    def __repr__(self):
+        return 'Bar(%s)' % ', '.join(
+            '%s=%r' % (name, getattr(self, name)) for name in FIELDS
+        )
+
+    def copy(self):
+        bar = self.__class__()
+        for name in FIELDS:
+            setattr(bar, name, getattr(self, name))
+        return bar
+
+
+def iter_bars(quotes, chunksize=None):
+    """Yield bars of the quotes (as the same `Bar` object).
+
+    Columns are converted to lists at once (by chunks of `chunksize`
+    bars if it's set), so there is no per bar conversion.
+    """
+    chunks = [quotes] if chunksize is None else quotes.chunks(chunksize)
+    bar = Bar()
+    for chunk in chunks:
+        columns = [chunk[name].tolist() for name in FIELDS]
+        for (
+            bar.id,
+            bar.time,
+            bar.open,
+            bar.high,
+            bar.low,
+            bar.close,
+            bar.volume,
+        ) in zip(*columns):
+            yield bar
+
+
+class AlignedBar(Bar):
+    """A bar of one of the symbols in a `BarSlice`.
+
+    If the symbol has no bar at the slice's time, `missing` is true and
+    the fields are of its last bar (forward-filled).
+    """
+
+    __slots__ = ('missing',)
+
+    def copy(self):
+        bar = super().copy()
+        bar.missing = self.missing
+        return bar
+
+
+class BarSlice:
+    """Bars of several symbols at the same time.
+
+    Bars are accessed by a symbol (or a ticker): `bars[symbol]` is
+    an `AlignedBar` or None before the first bar of the symbol.
+    The same objects are reused for all slices.
+    """
+
+    __slots__ = ('time', 'bars')
+
+    def __init__(self, tickers):
+        self.time = None
+        self.bars = dict.fromkeys(tickers)
+
+    def __getitem__(self, symbol):
+        return self.bars[getattr(symbol, 'ticker', symbol)]
+
+    def __iter__(self):
+        return iter(self.bars.items())
+
+
+class HigherTimeframe:
+    """Quotes of a higher timeframe as they're known on the base bars.
+
+    `index[i]` is the index of the last bar of `quotes` completed by
+    the end of the i-th base bar (-1 if there is none), so a bar that
+    is still forming is never seen. It can be used in vectorized
+    calculations, e.g. `quotes.close[index]` (mind -1), or per bar
+    via `last`.
+    """
+
+    def __init__(self, base, quotes):
+        self.base = base
+        self.quotes = quotes
+        self.index = completed_bars(base, quotes)
+        self._index = self.index.tolist()
+        self._rows = list(zip(*[quotes[name].tolist() for name in FIELDS]))
+
+    def last(self, bar, ago=0):
+        """Return the last completed bar (or `ago` bars before it).
+
+        * bar - the current bar of the base quotes.
+        Returns a new `Bar` or None, if there is no such bar yet.
+        """
+        i = self._index[self.base.bar_index(bar.time, bar.id)] - ago
+        if i < 0:
+            return None
+        result = Bar()
+        (
+            result.id,
+            result.time,
+            result.open,
+            result.high,
+            result.low,
+            result.close,
+            result.volume,
+        ) = self._rows[i]
+        return result
+
+
+def _aligned_chunks(quotes, chunksize=None):
+    """Yield {ticker: quotes} of consecutive ranges of time.
+
+    A range has at most `chunksize` bars of each symbol (all of them
+    if it's None), it ends at the time of the last bar of the chunk
+    which ends first.
+    """
+    if chunksize is None:
+        yield quotes
+        return
+    starts = dict.fromkeys(quotes, 0)
+    while True:
+        left = [t for t, q in quotes.items() if starts[t] < len(q)]
+        if not left:
+            return
+        end = min(
+            quotes[t].time[min(starts[t] + chunksize, len(quotes[t])) - 1]
+            for t in left
+        )
+        chunk = {}
+        for ticker in left:
+            q, start = quotes[ticker], starts[ticker]
+            times = q.time[start : start + chunksize]
+            stop = start + int(np.searchsorted(times, end, side='right'))
+            chunk[ticker] = q[start:stop]
+            starts[ticker] = stop
+        yield chunk
+
+
+def iter_bar_slices(quotes, chunksize=None):
+    """Yield bars of several symbols aligned by time (as `BarSlice`).
+
+    * quotes - a dict of quotes by the ticker.
+    The time axes of the quotes are merged and the position of every bar
+    on the merged axis is calculated once (for each range of time with
+    at most `chunksize` bars of a symbol, if it's set), so the loop only
+    updates the bars of the symbols that have a bar at the current time.
+    """
+    aligned = {ticker: AlignedBar() for ticker in quotes}
+    bar_slice = BarSlice(quotes)
+    bars = bar_slice.bars
+    for chunk in _aligned_chunks(quotes, chunksize):
+        times = np.unique(np.concatenate([q.time for q in chunk.values()]))
+        # for every time: (ticker, bar, row) of the symbols that have a bar
+        updates = [[] for _ in range(len(times))]
+        for ticker, q in chunk.items():
+            bar = aligned[ticker]
+            positions = np.searchsorted(times, q.time).tolist()
+            rows = zip(*[q[name].tolist() for name in FIELDS])
+            for i, row in zip(positions, rows):
+                updates[i].append((ticker, bar, row))
+        for time, updated in zip(times.tolist(), updates):
+            bar_slice.time = time
+            for bar in bars.values():
+                if bar is not None:
+                    bar.missing = True
+            for ticker, bar, row in updated:
+                (
+                    bar.id,
+                    bar.time,
+                    bar.open,
+                    bar.high,
+                    bar.low,
+                    bar.close,
+                    bar.volume,
+                ) = row
+                bar.missing = False
+                bars[ticker] = bar
+            yield bar_slice
+
+
+def signals_to_positions(
+    long_entries=None, short_entries=None, exits=None, size=None
+):
+    """Return a position after each bar: 1 - long, -1 - short, 0 - none.
+
+    A position is kept until an opposite entry (the position is reversed)
+    or an exit. If a bar has several signals, a long entry takes precedence
+    over a short entry and an entry takes precedence over an exit.
+    Signals that aren't set (None) are never given. `size` is the number
+    of bars (by default the length of the signals).
+    """
+    masks = (exits, short_entries, long_entries)
+    if size is None:
+        size = next((len(mask) for mask in masks if mask is not None), 0)
+    signal = np.zeros(size, dtype=int)
+    has_signal = np.zeros(size, dtype=bool)
+    for mask, value in zip(masks, (0, -1, 1)):
+        if mask is not None:
+            mask = np.asarray(mask, dtype=bool)
+            signal[mask] = value
+            has_signal |= mask
+    # index of the last signal up to each bar
+    index = np.where(has_signal, np.arange(size), 0)
+    index = np.maximum.accumulate(index)
+    return np.where(has_signal[index], signal[index], 0)
+
+
+def execute_signals(
+    symbol, quotes, volume, long_entries=None, short_entries=None, exits=None
+):
+    """Open and close positions by signals and return the opened positions.
+
+    Orders for the signals of a bar are executed at the open of the next
+    bar. Positions are searched with array operations, so only the actual
+    trades are processed one by one.
+    """
+    if not len(quotes):
+        return []
+    target = signals_to_positions(
+        long_entries, short_entries, exits, size=len(quotes)
+    )
+    # the position held during each bar
+    held = np.concatenate(([0], target[:-1]))
+    changes = np.flatnonzero(np.diff(held, prepend=0))
+    opens = quotes.open[changes].tolist()
+    times = quotes.time[changes].tolist()
+    positions = []
+    position = None
+    for i, price, time, direction in zip(
+        changes.tolist(), opens, times, held[changes].tolist()
+    ):
+        if position is not None:
+            position.close(price=price, time=time, id_bar=i)
+            position = None
+        if direction:
+            position = Position(
+                symbol=symbol,
+                ptype=Order.BUY if direction > 0 else Order.SELL,
+                price=price,
+                volume=volume,
+                open_time=time,
+                quotes=quotes,
+                id_bar_open=i,
+            )
+            Portfolio.add_position(position)
+            positions.append(position)
+    return positions
+
+
+# columns of the quotes passed to a kernel
+KERNEL_FIELDS = ('time', 'open', 'high', 'low', 'close', 'volume')
+# compiled kernels (None - the kernel can't be compiled)
+_compiled = {}
+
+
+def _compile(kernel):
+    if numba is None:
+        return None
+    if kernel not in _compiled:
+        _compiled[kernel] = numba.njit(kernel)
+    return _compiled[kernel]
+
+
+def run_kernel(kernel, quotes, args=(), jit=True):
+    """Run the kernel over the quotes and return its signals.
+
+    The kernel is called as `kernel(signals, time, open, high, low, close,
+    volume, *args)` and should set `signals[i]` to 1 (buy) or -1 (sell).
+    If `jit` is true and numba is installed, the kernel is compiled,
+    otherwise (or if it can't be compiled) it's run by the interpreter.
+    Either way it gets the same numpy arrays.
+    """
+    compiled = _compile(kernel) if jit else None
+    signals = np.zeros(len(quotes), dtype=np.int8)
+    columns = [np.ascontiguousarray(quotes[name]) for name in KERNEL_FIELDS]
+    if compiled is not None:
+        try:
+            compiled(signals, *columns, *args)
+            return signals
+        except NumbaError:
+            # typing errors are raised on the first call
+            logger.warning(
+                'Kernel %s is not compiled, it is run by the interpreter',
+                kernel.__qualname__,
+                exc_info=True,
+            )
+            _compiled[kernel] = None
+    kernel(signals, *columns, *args)
+    return signals
@@ -0,0 +1,481 @@
+"""Indicators.
+
+Every indicator can be calculated in two ways with identical results:
+    * streaming - `update` takes the next bar's value(s) and returns
+      the current value of the indicator, it takes O(1) time per bar;
+    * vectorized - `calculate` takes the whole columns and returns
+      an array of values (and sets it to `data` for plotting).
+Values that can't be calculated yet (at the start) are NaN.
+"""
+
+import math
+import threading
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+
+import numpy as np
+import pandas as pd
+
+from .base import Indicator
+
+__all__ = (
+    'ATR',
+    'EMA',
+    'MACD',
+    'RSI',
+    'SMA',
+    'BollingerBands',
+    'IndicatorCache',
+    'RollingMax',
+    'RollingMin',
+    'RollingStd',
+)
+
+
+NAN = float('nan')
+
+
+def _rolling_sums(values, window):
+    """Return sums of the last `window` values for every value.
+
+    The sum is updated by the difference of the new and the dropped
+    values, just like in the streaming calculation, so the results
+    are the same.
+    """
+    diffs = np.array(values, dtype=float)
+    diffs[window:] -= values[:-window]
+    return np.cumsum(diffs)
+
+
+def _smooth(values, alpha=None, window=None, start=0):
+    """Return the exponential smoothing of values (from `start`).
+
+    The smoothing factor is either `alpha` or 1 / `window` (by Wilder).
+    It's a recurrence, so it's calculated in a loop (over a list, which
+    is much faster than over an array) by the same formula as in the
+    streaming calculation.
+    """
+    result = np.full(len(values), np.nan)
+    if start >= len(values):
+        return result
+    values = np.asarray(values, dtype=float).tolist()
+    value = values[start]
+    smoothed = [value]
+    if window is None:
+        for x in values[start + 1 :]:
+            value += alpha * (x - value)
+            smoothed.append(value)
+    else:
+        for x in values[start + 1 :]:
+            value += (x - value) / window
+            smoothed.append(value)
+    result[start:] = smoothed
+    return result
+
+
+def _warm_up(values, count):
+    values[: count - 1] = np.nan
+    return values
+
+
+class BaseIndicator(Indicator, ABC):
+    """Base class of the indicators.
+
+    * inputs - names of the quotes columns the indicator is calculated on.
+    * lines - names of the returned values (if there are several).
+    """
+
+    inputs = ('close',)
+    lines = None
+
+    def __init__(self, window, label=None, **kwargs):
+        label = label or '%s(%s)' % (self.__class__.__name__, window)
+        super().__init__(label=label, window=window, **kwargs)
+        self.reset()
+
+    def reset(self):
+        """Reset the state of the streaming calculation."""
+        self._count = 0
+
+    @abstractmethod
+    def update(self, *values):
+        """Add the next bar and return the current value."""
+
+    @abstractmethod
+    def calculate(self, *columns):
+        """Return values for all bars of the columns."""
+
+    def calculate_quotes(self, quotes):
+        """Calculate the indicator over the `inputs` columns of quotes."""
+        result = self.calculate(*[quotes[name] for name in self.inputs])
+        self.data = result if self.lines is None else result[0]
+        return result
+
+
+class SMA(BaseIndicator):
+    """Simple Moving Average."""
+
+    def reset(self):
+        super().reset()
+        self._values = deque()
+        self._sum = 0.0
+
+    def update(self, value):
+        dropped = self._values.popleft() if self._count >= self.window else 0
+        self._values.append(value)
+        self._sum += value - dropped
+        self._count += 1
+        if self._count < self.window:
+            return NAN
+        return self._sum / self.window
+
+    def calculate(self, values):
+        result = _rolling_sums(values, self.window) / self.window
+        return _warm_up(result, self.window)
+
+
+class EMA(BaseIndicator):
+    """Exponential Moving Average (starts from the first value)."""
+
+    def __init__(self, window, **kwargs):
+        super().__init__(window, **kwargs)
+        self.alpha = 2 / (window + 1)
+
+    def reset(self):
+        super().reset()
+        self._value = None
+
+    def update(self, value):
+        if self._value is None:
+            self._value = value
+        else:
+            self._value += self.alpha * (value - self._value)
+        self._count += 1
+        if self._count < self.window:
+            return NAN
+        return self._value
+
+    def calculate(self, values):
+        return _warm_up(_smooth(values, self.alpha), self.window)
+
+
+class RollingStd(BaseIndicator):
+    """Rolling (population) Standard Deviation."""
+
+    def reset(self):
+        super().reset()
+        self._values = deque()
+        self._sum = 0.0
+        self._sum_sq = 0.0
+
+    def update(self, value):
+        dropped = self._values.popleft() if self._count >= self.window else 0
+        self._values.append(value)
+        self._sum += value - dropped
+        self._sum_sq += value * value - dropped * dropped
+        self._count += 1
+        if self._count < self.window:
+            return NAN
+        mean = self._sum / self.window
+        return math.sqrt(max(self._sum_sq / self.window - mean * mean, 0))
+
+    def calculate(self, values):
+        values = np.asarray(values, dtype=float)
+        mean = _rolling_sums(values, self.window) / self.window
+        mean_sq = _rolling_sums(values * values, self.window) / self.window
+        result = np.sqrt(np.maximum(mean_sq - mean * mean, 0))
+        return _warm_up(result, self.window)
+
+
+class _RollingExtremum(BaseIndicator):
+    # a monotonic deque of (index, value), the first one is the extremum
+    def reset(self):
+        super().reset()
+        self._deque = deque()
+
+    @abstractmethod
+    def _is_dominated(self, old, new):
+        """Whether the old value can't be the extremum after the new one."""
+
+    def update(self, value):
+        window = self._deque
+        while window and self._is_dominated(window[-1][1], value):
+            window.pop()
+        window.append((self._count, value))
+        if window[0][0] <= self._count - self.window:
+            window.popleft()
+        self._count += 1
+        if self._count < self.window:
+            return NAN
+        return window[0][1]
+
+
+class RollingMax(_RollingExtremum):
+    """Maximum of the last `window` values."""
+
+    def _is_dominated(self, old, new):
+        return old <= new
+
+    def calculate(self, values):
+        return pd.Series(values).rolling(self.window).max().values
+
+
+class RollingMin(_RollingExtremum):
+    """Minimum of the last `window` values."""
+
+    def _is_dominated(self, old, new):
+        return old >= new
+
+    def calculate(self, values):
+        return pd.Series(values).rolling(self.window).min().values
+
+
+class ATR(BaseIndicator):
+    """Average True Range (smoothed by Wilder)."""
+
+    inputs = ('high', 'low', 'close')
+
+    def reset(self):
+        super().reset()
+        self._close = None
+        self._value = None
+
+    def update(self, high, low, close):
+        if self._close is None:
+            true_range = high - low
+        else:
+            true_range = max(
+                high - low, abs(high - self._close), abs(low - self._close)
+            )
+        self._close = close
+        if self._value is None:
+            self._value = true_range
+        else:
+            self._value += (true_range - self._value) / self.window
+        self._count += 1
+        if self._count < self.window:
+            return NAN
+        return self._value
+
+    def calculate(self, high, low, close):
+        true_range = np.asarray(high - low, dtype=float)
+        if len(true_range) > 1:
+            prev_close = close[:-1]
+            true_range[1:] = np.maximum(
+                true_range[1:],
+                np.maximum(
+                    np.abs(high[1:] - prev_close), np.abs(low[1:] - prev_close)
+                ),
+            )
+        result = _smooth(true_range, window=self.window)
+        return _warm_up(result, self.window)
+
+
+class RSI(BaseIndicator):
+    """Relative Strength Index (smoothed by Wilder)."""
+
+    def reset(self):
+        super().reset()
+        self._prev = None
+        self._gain = None
+        self._loss = None
+
+    def update(self, value):
+        self._count += 1
+        if self._prev is None:
+            self._prev = value
+            return NAN
+        change = value - self._prev
+        self._prev = value
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        if self._gain is None:
+            self._gain, self._loss = gain, loss
+        else:
+            self._gain += (gain - self._gain) / self.window
+            self._loss += (loss - self._loss) / self.window
+        if self._count <= self.window:
+            return NAN
+        if self._loss == 0:
+            return 100.0
+        return 100 - 100 / (1 + self._gain / self._loss)
+
+    def calculate(self, values):
+        changes = np.diff(np.asarray(values, dtype=float), prepend=np.nan)
+        gains = np.maximum(changes, 0.0)
+        losses = np.maximum(-changes, 0.0)
+        gains = _smooth(gains, window=self.window, start=1)
+        losses = _smooth(losses, window=self.window, start=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            result = 100 - 100 / (1 + gains / losses)
+        result[losses == 0] = 100.0
+        return _warm_up(result, self.window + 1)
+
+
+class BollingerBands(BaseIndicator):
+    """Bollinger Bands: SMA and the bands at `k` standard deviations."""
+
+    lines = ('middle', 'upper', 'lower')
+
+    def __init__(self, window, k=2, **kwargs):
+        self.k = k
+        self._sma = SMA(window)
+        self._std = RollingStd(window)
+        super().__init__(window, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._sma.reset()
+        self._std.reset()
+
+    def update(self, value):
+        middle = self._sma.update(value)
+        deviation = self.k * self._std.update(value)
+        return middle, middle + deviation, middle - deviation
+
+    def calculate(self, values):
+        middle = self._sma.calculate(values)
+        deviation = self.k * self._std.calculate(values)
+        return middle, middle + deviation, middle - deviation
+
+
+class MACD(BaseIndicator):
+    """Moving Average Convergence/Divergence: macd, signal, histogram."""
+
+    lines = ('macd', 'signal', 'histogram')
+
+    def __init__(self, fast=12, slow=26, signal=9, label=None, **kwargs):
+        self._fast = EMA(fast)
+        self._slow = EMA(slow)
+        self._signal = EMA(signal)
+        label = label or 'MACD(%s, %s, %s)' % (fast, slow, signal)
+        super().__init__(slow, label=label, **kwargs)
+
+    def reset(self):
+        super().reset()
+        self._fast.reset()
+        self._slow.reset()
+        self._signal.reset()
+
+    def update(self, value):
+        # both EMAs start from the first value, so the difference is
+        # calculated (and smoothed by the signal line) from the start
+        self._fast.update(value)
+        self._slow.update(value)
+        macd = self._fast._value - self._slow._value
+        self._signal.update(macd)
+        self._count += 1
+        if self._count < self.window:
+            return NAN, NAN, NAN
+        signal = self._signal._value
+        return macd, signal, macd - signal
+
+    def calculate(self, values):
+        macd = _smooth(values, self._fast.alpha) - _smooth(
+            values, self._slow.alpha
+        )
+        signal = _smooth(macd, self._signal.alpha)
+        histogram = macd - signal
+        return tuple(
+            _warm_up(line, self.window) for line in (macd, signal, histogram)
+        )
+
+
+def _nbytes(result):
+    if isinstance(result, tuple):
+        return sum(values.nbytes for values in result)
+    return result.nbytes
+
+
+def _fingerprint(quotes):
+    if not len(quotes):
+        return ()
+    return (quotes.time[0], quotes.time[-1], quotes.close[0], quotes.close[-1])
+
+
+class BaseIndicatorCache:
+    """LRU cache of indicator values calculated over quotes.
+
+    Values are cached by the quotes (the object, not a copy of the data),
+    the indicator and its parameters, so the variants of an optimization
+    which have the same parameters of an indicator share its values.
+    The least recently used values are evicted when the total size
+    exceeds `max_bytes`. Returned arrays are read-only, since they are
+    shared between the callers.
+    """
+
+    def __init__(self, max_bytes=256 * 2 ** 20):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = self.misses = 0
+        self._cache = OrderedDict()
+        self._lock = threading.RLock()
+        # id of the quotes -> finalizer, which removes their values
+        self._finalizers = {}
+
+    def __len__(self):
+        return len(self._cache)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.nbytes = 0
+            for finalizer in self._finalizers.values():
+                finalizer.detach()
+            self._finalizers.clear()
+
+    def _remove_quotes(self, quotes_id):
+        with self._lock:
+            self._finalizers.pop(quotes_id, None)
+            for key in [key for key in self._cache if key[0] == quotes_id]:
+                self._pop(key)
+
+    def _pop(self, key):
+        fingerprint, result = self._cache.pop(key)
+        self.nbytes -= _nbytes(result)
+
+    def get(self, quotes, indicator, *args, **kwargs):
+        """Return values of the indicator over the quotes.
+
+        `indicator` is an indicator class (it's created with the args and
+        calculated by `calculate_quotes`) or a function that is called
+        as `indicator(quotes, *args, **kwargs)` and returns an array
+        (or a tuple of arrays). The args should be hashable.
+        """
+        key = (id(quotes), indicator, args, tuple(sorted(kwargs.items())))
+        fingerprint = _fingerprint(quotes)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None and cached[0] == fingerprint:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+        if isinstance(indicator, type) and issubclass(indicator, Indicator):
+            result = indicator(*args, **kwargs).calculate_quotes(quotes)
+        else:
+            result = indicator(quotes, *args, **kwargs)
+        for values in result if isinstance(result, tuple) else (result,):
+            values.flags.writeable = False
+        self._put(key, quotes, fingerprint, result)
+        return result
+
+    def _put(self, key, quotes, fingerprint, result):
+        size = _nbytes(result)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._cache:
+                # the quotes data have been changed (in place)
+                self._pop(key)
+            self._cache[key] = (fingerprint, result)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self._pop(next(iter(self._cache)))
+            if key[0] not in self._finalizers:
+                self._finalizers[key[0]] = weakref.finalize(
+                    quotes, self._remove_quotes, key[0]
+                )
+
+
+IndicatorCache = BaseIndicatorCache()
@@ -1,11 +1,17 @@
 """Parser."""
 
+import calendar
 import logging
 import os.path
 import pickle
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
 
 import pandas as pd
 import pandas_datareader.data as web
+import requests
 from pandas_datareader._utils import RemoteDataError
 from pandas_datareader.data import (
     get_data_google,
@@ -16,7 +22,9 @@ from pandas_datareader.data import (
 from pandas_datareader.nasdaq_trader import get_nasdaq_symbols
 from pandas_datareader.exceptions import ImmediateDeprecationError
 
-from .base import Quotes
+from .base import BaseQuotes
+from .storage import QuotesCache
+from .store import QuotesStore
 from .utils import get_data_path, timeit
 
 __all__ = (
@@ -25,75 +33,110 @@ __all__ = (
     'QuandleQuotesLoader',
     'get_symbols',
     'get_quotes',
+    'get_quotes_batch',
 )
 
 
 logger = logging.getLogger(__name__)
 
 
+class RateLimiter:
+    """Allow no more than `rate` calls per second (thread-safe)."""
+
+    def __init__(self, rate):
+        self.interval = 1 / rate
+        self._next_call = 0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_call - now
+            self._next_call = max(now, self._next_call) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
 class QuotesLoader:
 
     source = None
     timeframe = '1D'
     sort_index = False
     default_tf = None
-    name_format = '%(symbol)s_%(tf)s_%(date_from)s_%(date_to)s.%(ext)s'
+    # max number of requests per second to the source (None - unlimited)
+    rate_limit = None
+    retries = 2
+    retry_delay = 0.5  # sec, doubled on every next attempt
+
+    _rate_limiters = {}
+    _rate_limiters_lock = threading.Lock()
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
+    def _get(cls, symbol, date_from, date_to, session=None):
         quotes = web.DataReader(
-            symbol, cls.source, start=date_from, end=date_to
+            symbol, cls.source, start=date_from, end=date_to, session=session
         )
         if cls.sort_index:
             quotes.sort_index(inplace=True)
         return quotes
 
     @classmethod
-    def _get_file_path(cls, symbol, tf, date_from, date_to):
-        fname = cls.name_format % {
-            'symbol': symbol,
-            'tf': tf,
-            'date_from': date_from.isoformat(),
-            'date_to': date_to.isoformat(),
-            'ext': 'qdom',
-        }
-        return os.path.join(get_data_path('stock_data'), fname)
+    def _get_cache(cls):
+        return QuotesCache(get_data_path('stock_data'))
 
     @classmethod
-    def _save_to_disk(cls, fpath, data):
-        logger.debug('Saving quotes to a file: %s', fpath)
-        with open(fpath, 'wb') as f:
-            pickle.dump(data, f, pickle.HIGHEST_PROTOCOL)
+    def _get_rate_limiter(cls):
+        with cls._rate_limiters_lock:
+            if cls.source not in cls._rate_limiters:
+                cls._rate_limiters[cls.source] = RateLimiter(cls.rate_limit)
+            return cls._rate_limiters[cls.source]
 
     @classmethod
-    def _load_from_disk(cls, fpath):
-        logger.debug('Loading quotes from a file: %s', fpath)
-        with open(fpath, 'rb') as f:
-            return pickle.load(f)
+    def _fetch(cls, symbol, start, end, session=None):
+        date_from = datetime.utcfromtimestamp(start).date()
+        date_to = datetime.utcfromtimestamp(end).date() - timedelta(days=1)
+        logger.debug('Fetching quotes: %s %s - %s', symbol, date_from, date_to)
+        for attempt in range(cls.retries + 1):
+            if cls.rate_limit:
+                cls._get_rate_limiter().wait()
+            try:
+                quotes_raw = cls._get(
+                    symbol, date_from, date_to, session=session
+                )
+                break
+            except (RemoteDataError, requests.RequestException) as e:
+                if attempt == cls.retries:
+                    raise
+                logger.warning('_fetch => error: %r, retry...', e)
+                time.sleep(cls.retry_delay * 2 ** attempt)
+        return BaseQuotes().new(
+            quotes_raw, source=cls.source, default_tf=cls.default_tf
+        )
 
     @classmethod
     @timeit
-    def get_quotes(cls, symbol, date_from, date_to):
-        quotes = None
-        fpath = cls._get_file_path(symbol, cls.timeframe, date_from, date_to)
-        if os.path.exists(fpath):
-            quotes = Quotes.new(cls._load_from_disk(fpath))
-        else:
-            quotes_raw = cls._get(symbol, date_from, date_to)
-            quotes = Quotes.new(
-                quotes_raw, source=cls.source, default_tf=cls.default_tf
-            )
-            cls._save_to_disk(fpath, quotes)
-        return quotes
+    def get_quotes(cls, symbol, date_from, date_to, quotes=None, session=None):
+        """Load quotes into `quotes` (new `BaseQuotes` by default)."""
+        columns = cls._get_cache().get(
+            symbol,
+            cls.timeframe,
+            start=_to_timestamp(date_from),
+            end=_to_timestamp(date_to + timedelta(days=1)),
+            fetch=lambda start, end: cls._fetch(symbol, start, end, session),
+            complete_before=_to_timestamp(datetime.utcnow().date()),
+        )
+        quotes = BaseQuotes() if quotes is None else quotes
+        return quotes.new(columns, source=cls.source, default_tf=cls.default_tf)
 
 
 class YahooQuotesLoader(QuotesLoader):
 
     source = 'yahoo'
+    rate_limit = 2
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
-        return get_data_yahoo(symbol, date_from, date_to)
+    def _get(cls, symbol, date_from, date_to, session=None):
+        return get_data_yahoo(symbol, date_from, date_to, session=session)
 
 
 class GoogleQuotesLoader(QuotesLoader):
@@ -101,12 +144,12 @@ class GoogleQuotesLoader(QuotesLoader):
     source = 'google'
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
+    def _get(cls, symbol, date_from, date_to, session=None):
         # FIXME: temporary fix
         from pandas_datareader.google.daily import GoogleDailyReader
 
         GoogleDailyReader.url = 'http://finance.google.com/finance/historical'
-        return get_data_google(symbol, date_from, date_to)
+        return get_data_google(symbol, date_from, date_to, session=session)
 
 
 class QuandleQuotesLoader(QuotesLoader):
@@ -114,8 +157,8 @@ class QuandleQuotesLoader(QuotesLoader):
     source = 'quandle'
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
-        quotes = get_data_quandl(symbol, date_from, date_to)
+    def _get(cls, symbol, date_from, date_to, session=None):
+        quotes = get_data_quandl(symbol, date_from, date_to, session=session)
         quotes.sort_index(inplace=True)
         return quotes
 
@@ -126,9 +169,9 @@ class AlphaVantageQuotesLoader(QuotesLoader):
     api_key = 'demo'
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
+    def _get(cls, symbol, date_from, date_to, session=None):
         quotes = get_data_alphavantage(
-            symbol, date_from, date_to, api_key=cls.api_key
+            symbol, date_from, date_to, api_key=cls.api_key, session=session
         )
         return quotes
 
@@ -138,16 +181,18 @@ class StooqQuotesLoader(QuotesLoader):
     source = 'stooq'
     sort_index = True
     default_tf = 1440
+    rate_limit = 2
 
 
 class IEXQuotesLoader(QuotesLoader):
 
     source = 'iex'
+    rate_limit = 10
 
     @classmethod
-    def _get(cls, symbol, date_from, date_to):
+    def _get(cls, symbol, date_from, date_to, session=None):
         quotes = web.DataReader(
-            symbol, cls.source, start=date_from, end=date_to
+            symbol, cls.source, start=date_from, end=date_to, session=session
         )
         quotes['Date'] = pd.to_datetime(quotes.index)
         return quotes
@@ -158,6 +203,10 @@ class RobinhoodQuotesLoader(QuotesLoader):
     source = 'robinhood'
 
 
+def _to_timestamp(date):
+    return calendar.timegm(date.timetuple())
+
+
 def get_symbols():
     fpath = os.path.join(get_data_path('stock_data'), 'symbols.qdom')
     if os.path.exists(fpath):
@@ -171,17 +220,86 @@ def get_symbols():
     return symbols
 
 
-def get_quotes(*args, **kwargs):
-    quotes = []
-    # don't work:
-    # GoogleQuotesLoader, QuandleQuotesLoader,
-    # AlphaVantageQuotesLoader, RobinhoodQuotesLoader
-    loaders = [YahooQuotesLoader, IEXQuotesLoader, StooqQuotesLoader]
-    while loaders:
-        loader = loaders.pop(0)
+# don't work:
+# GoogleQuotesLoader, QuandleQuotesLoader,
+# AlphaVantageQuotesLoader, RobinhoodQuotesLoader
+LOADERS = (YahooQuotesLoader, IEXQuotesLoader, StooqQuotesLoader)
+
+
+def _load_quotes(symbol, date_from, date_to, loaders, **kwargs):
+    for loader in loaders:
         try:
-            quotes = loader.get_quotes(*args, **kwargs)
-            break
+            return loader.get_quotes(symbol, date_from, date_to, **kwargs)
         except (RemoteDataError, ImmediateDeprecationError) as e:
             logger.error('get_quotes => error: %r', e)
+
+
+def get_quotes(symbol, date_from, date_to, loaders=LOADERS, store=None):
+    """Load quotes of the symbol into the store (`QuotesStore` by default).
+
+    If none of the loaders could load the quotes, an empty list
+    is returned.
+    """
+    quotes = _load_quotes(symbol, date_from, date_to, loaders)
+    if quotes is None:
+        return []
+    store = QuotesStore if store is None else store
+    store.add(symbol, quotes)
     return quotes
+
+
+@timeit
+def get_quotes_batch(
+    symbols,
+    date_from,
+    date_to,
+    loaders=LOADERS,
+    store=None,
+    max_workers=8,
+    callback=None,
+):
+    """Return a dict {symbol: quotes} of concurrently loaded quotes.
+
+    Every worker thread reuses its own HTTP session. Quotes are saved
+    into the cache and added to the store (`QuotesStore` by default)
+    as soon as they are loaded and `callback(symbol, quotes)` is called
+    (in the calling thread) for each of them. Symbols that failed to
+    load are logged and skipped.
+    """
+    store = QuotesStore if store is None else store
+    local = threading.local()
+    sessions = []
+
+    def _load(symbol):
+        if not hasattr(local, 'session'):
+            local.session = requests.Session()
+            sessions.append(local.session)
+        return _load_quotes(
+            symbol, date_from, date_to, loaders, session=local.session
+        )
+
+    results = {}
+    try:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_load, symbol): symbol
+                for symbol in dict.fromkeys(symbols)
+            }
+            for future in as_completed(futures):
+                symbol = futures[future]
+                try:
+                    quotes = future.result()
+                except Exception:
+                    # a failed symbol doesn't stop loading of the others
+                    logger.exception('get_quotes_batch => %s: error', symbol)
+                    continue
+                if quotes is None:
+                    continue
+                store.add(symbol, quotes)
+                results[symbol] = quotes
+                if callback is not None:
+                    callback(symbol, quotes)
+    finally:
+        for session in sessions:
+            session.close()
+    return results
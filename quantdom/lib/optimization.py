@@ -0,0 +1,615 @@
+"""Optimization of the strategies' parameters."""
+
+import heapq
+import math
+import multiprocessing
+import os
+import os.path
+import pickle
+import shutil
+import tempfile
+from abc import ABC, abstractmethod
+
+import numpy as np
+
+from .context import RunContext
+from .performance import BriefPerformance
+from .portfolio import BasePortfolio
+from .storage import MappedQuotes, save_quotes
+from .store import BaseQuotesStore
+from .utils import strategies_from_file, timeit
+
+__all__ = (
+    'BayesianSearch',
+    'BudgetSearch',
+    'GeneticSearch',
+    'ParamGrid',
+    'RandomSearch',
+    'SuccessiveHalving',
+    'TopResults',
+    'publish_quotes',
+    'run_parallel',
+)
+
+
+class ParamGrid:
+    """All combinations of the parameters' values (like `itertools.product`).
+
+    A combination is calculated by its index (the index is a mixed radix
+    number which digits are indexes of the values), so the grid takes
+    the same memory whatever its size, and any part of it can be run
+    separately: by chunks or starting from an index (e.g. to resume
+    an interrupted optimization).
+    """
+
+    def __init__(self, params):
+        self.keys = list(params.keys())
+        self.values = [list(values) for values in params.values()]
+        self._size = 1
+        for values in self.values:
+            self._size *= len(values)
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError(index)
+        picked = (
+            values[i] for values, i in zip(self.values, self.digits(index))
+        )
+        return dict(zip(self.keys, picked))
+
+    def __iter__(self):
+        return self.variants()
+
+    @property
+    def sizes(self):
+        return [len(values) for values in self.values]
+
+    def digits(self, index):
+        """Return indexes of the values of the combination."""
+        digits = []
+        # the last parameter changes first
+        for values in reversed(self.values):
+            index, i = divmod(index, len(values))
+            digits.append(i)
+        return digits[::-1]
+
+    def index(self, digits):
+        """Return the index of the combination by indexes of its values."""
+        index = 0
+        for values, i in zip(self.values, digits):
+            index = index * len(values) + int(i)
+        return index
+
+    def variants(self, start=0, stop=None):
+        """Yield the combinations (as kwargs) from start to stop."""
+        stop = len(self) if stop is None else min(stop, len(self))
+        for index in range(start, stop):
+            yield self[index]
+
+    def chunks(self, size, start=0):
+        """Yield ranges of indexes of the combinations by size."""
+        for chunk_start in range(start, len(self), size):
+            yield range(chunk_start, min(chunk_start + size, len(self)))
+
+
+def _rank_value(value):
+    value = float(value)
+    # NaN is worse than any value
+    return float('-inf') if value != value else value
+
+
+class TopResults:
+    """The best results of an optimization and statistics of all of them.
+
+    Only `size` rows (of `BriefPerformance`) with the highest `objective`
+    are kept, the others are only taken into account by the statistics:
+    the objective by the values of each parameter (`histograms`) and
+    its quantiles (estimated by a sample of `sample_size` values),
+    so the memory doesn't depend on the number of variants.
+    """
+
+    def __init__(self, size, objective='net_profit_abs', sample_size=10_000):
+        self.size = size
+        self.objective = objective
+        self.sample_size = sample_size
+        self.count = 0
+        self.best = float('-inf')
+        # {param: {value: [count, sum, max] of the objective}}
+        self.histograms = {}
+        self.sample = []
+        self._rng = np.random.RandomState(0)
+        # (objective, -index, row), the worst row is the first
+        self._heap = []
+
+    def __len__(self):
+        return len(self._heap)
+
+    def add(self, rows, start=0):
+        """Add the rows of the variants with indexes from start."""
+        for i, value in enumerate(rows[self.objective]):
+            value = _rank_value(value)
+            key = (value, -(start + i))
+            # the row is copied only if it's kept
+            if len(self._heap) < self.size:
+                heapq.heappush(self._heap, key + (rows[i : i + 1].copy(),))
+            elif key > self._heap[0][:2]:
+                heapq.heapreplace(self._heap, key + (rows[i : i + 1].copy(),))
+            self._add_stats(value, rows[i].kwargs)
+
+    def _add_stats(self, value, kwargs):
+        self.count += 1
+        self.best = max(self.best, value)
+        for key, param in kwargs.items():
+            bins = self.histograms.setdefault(key, {})
+            stats = bins.get(param)
+            if stats is None:
+                bins[param] = [1, value, value]
+            else:
+                stats[0] += 1
+                stats[1] += value
+                stats[2] = max(stats[2], value)
+        # reservoir sampling
+        if len(self.sample) < self.sample_size:
+            self.sample.append(value)
+        else:
+            i = self._rng.randint(self.count)
+            if i < self.sample_size:
+                self.sample[i] = value
+
+    def quantiles(self, q):
+        """Return (estimated) quantiles of the objective, q in [0, 1]."""
+        sample = np.array(self.sample, dtype=float)
+        sample = sample[np.isfinite(sample)]
+        if not len(sample):
+            return np.full(np.shape(q), np.nan)
+        return np.quantile(sample, q)
+
+    def brief_performance(self):
+        """Return the kept rows, the best first."""
+        if not self._heap:
+            return BriefPerformance(shape=(0,))
+        rows = [row for _, _, row in sorted(self._heap, reverse=True)]
+        return np.concatenate(rows).view(BriefPerformance)
+
+
+def _prefix_store(store, symbols, fraction):
+    """Return a store with the first fraction of the quotes of the symbols.
+
+    The quotes of all symbols end at the same time as the prefix
+    of the first symbol's quotes.
+    """
+    prefix = BaseQuotesStore()
+    quotes = store.get(symbols[0])
+    end_time = quotes.time[max(1, int(len(quotes) * fraction)) - 1]
+    for symbol in symbols:
+        quotes = store.get(symbol)
+        stop = np.searchsorted(quotes.time, end_time, side='right')
+        prefix.add(symbol, quotes[:stop])
+    return prefix
+
+
+class SuccessiveHalving:
+    """Search which backtests fewer variants on more quotes at each round.
+
+    All variants are backtested on the first `min_fraction` of the quotes,
+    then only 1/`eta` of them with the best objective are backtested
+    on `eta` times more quotes and so on, the last variants are
+    backtested on all quotes. So the bad variants are dropped after
+    a short backtest. `rounds` are (fraction, number of variants).
+    """
+
+    def __init__(self, min_fraction=0.2, eta=3):
+        if not 0 < min_fraction <= 1 or eta <= 1:
+            raise ValueError('Wrong min_fraction or eta')
+        self.min_fraction = min_fraction
+        self.eta = eta
+        self.rounds = []
+
+    def _fractions(self):
+        fraction = self.min_fraction
+        while fraction < 1:
+            yield fraction
+            fraction *= self.eta
+        yield 1
+
+    def run(self, portfolio, strategy, grid, objective='net_profit_abs'):
+        """Return results of the variants backtested on all quotes.
+
+        The results (`BriefPerformance`) are sorted, the best first.
+        """
+        self.rounds = []
+        indexes = range(len(grid))
+        context = strategy.context
+        # the year profit is for all quotes in every round
+        days = portfolio._period_days(strategy)
+        try:
+            for fraction in self._fractions():
+                if fraction == 1 or len(indexes) == 1:
+                    fraction, store = 1, context.store
+                else:
+                    store = _prefix_store(
+                        context.store, strategy.symbols, fraction
+                    )
+                strategy.context = RunContext(
+                    portfolio=BasePortfolio(
+                        portfolio.initial_balance, portfolio.leverage, store
+                    )
+                )
+                strategy.context.portfolio.timeframe = portfolio.timeframe
+                brief = BriefPerformance(shape=(len(indexes),))
+                brief.days = days
+                for i, index in enumerate(indexes):
+                    strategy.context.portfolio._evaluate(
+                        strategy, grid[index], brief, i
+                    )
+                self.rounds.append((fraction, len(indexes)))
+                # the best first, the earlier variant of the equal ones first
+                order = sorted(
+                    range(len(indexes)),
+                    key=lambda i: (-_rank_value(brief[objective][i]), i),
+                )
+                if fraction == 1:
+                    return brief[order]
+                keep = max(1, math.ceil(len(indexes) / self.eta))
+                indexes = sorted(indexes[i] for i in order[:keep])
+        finally:
+            strategy.context = context
+
+
+class BudgetSearch(ABC):
+    """Search which backtests at most `budget` variants of the grid.
+
+    Subclasses propose (`_propose`) the indexes of the variants to
+    backtest next, knowing the objective of the backtested ones
+    (`values`: {index: objective}). If the grid isn't bigger than
+    the budget, all variants are backtested.
+    """
+
+    def __init__(self, budget=200, seed=0):
+        self.budget = budget
+        self.seed = seed
+        self.values = {}
+
+    @abstractmethod
+    def _propose(self, grid):
+        """Return indexes of the variants to backtest next."""
+
+    def _random(self, grid, count):
+        """Return up to count random new indexes."""
+        indexes = []
+        for _ in range(count * 10):
+            if len(indexes) == count:
+                break
+            index = grid.index(
+                [self._rng.randint(size) for size in grid.sizes]
+            )
+            if index not in self.values and index not in indexes:
+                indexes.append(index)
+        if not indexes:
+            # almost all variants are backtested
+            indexes = [i for i in range(len(grid)) if i not in self.values]
+        return indexes[:count]
+
+    def run(self, portfolio, strategy, grid, objective='net_profit_abs'):
+        """Return results of the backtested variants, the best first."""
+        self._rng = np.random.RandomState(self.seed)
+        self.values = {}
+        budget = min(self.budget, len(grid))
+        brief = BriefPerformance(shape=(budget,))
+        brief.days = portfolio._period_days(strategy)
+        with portfolio.optimization_mode():
+            while len(self.values) < budget:
+                if budget == len(grid):
+                    indexes = range(len(grid))
+                else:
+                    indexes = [
+                        i for i in self._propose(grid) if i not in self.values
+                    ]
+                    indexes = indexes or self._random(grid, 1)
+                for index in indexes:
+                    if len(self.values) == budget:
+                        break
+                    if index in self.values:
+                        continue
+                    i = len(self.values)
+                    portfolio._evaluate(strategy, grid[index], brief, i)
+                    self.values[index] = _rank_value(brief[objective][i])
+        order = sorted(
+            range(len(brief)),
+            key=lambda i: (-_rank_value(brief[objective][i]), i),
+        )
+        return brief[order]
+
+
+class RandomSearch(BudgetSearch):
+    """Search which backtests random variants."""
+
+    def _propose(self, grid):
+        return self._random(grid, self.budget - len(self.values))
+
+
+class BayesianSearch(BudgetSearch):
+    """Search guided by a local surrogate model of the objective.
+
+    After `initial` random variants, `candidates` variants are sampled
+    around the best one (within `radius` of the range of each parameter)
+    and the one with the highest upper confidence bound of the objective
+    is backtested. The objective of a candidate is predicted by a kernel
+    regression on the backtested variants, its uncertainty grows with
+    the distance from them. The region grows after an improvement
+    and shrinks after a few failures (then it starts over).
+    """
+
+    def __init__(
+        self,
+        budget=200,
+        initial=20,
+        candidates=200,
+        radius=0.2,
+        kappa=1.0,
+        seed=0,
+    ):
+        super().__init__(budget, seed)
+        self.initial = initial
+        self.candidates = candidates
+        self.radius = radius
+        self.kappa = kappa
+
+    def run(self, portfolio, strategy, grid, objective='net_profit_abs'):
+        self._radius = self.radius
+        self._best = float('-inf')
+        self._failures = 0
+        return super().run(portfolio, strategy, grid, objective)
+
+    def _update_radius(self, best, max_size):
+        if best > self._best:
+            self._best = best
+            self._failures = 0
+            self._radius = min(self._radius * 2, 0.5)
+            return
+        self._failures += 1
+        if self._failures >= 3:
+            self._failures = 0
+            self._radius /= 2
+            if self._radius * max_size < 0.5:
+                # the region has no other variants
+                self._radius = self.radius
+
+    def _propose(self, grid):
+        if len(self.values) < self.initial:
+            return self._random(grid, self.initial - len(self.values))
+        sizes = np.array(grid.sizes)
+        scale = np.maximum(sizes - 1, 1)
+        indexes = list(self.values)
+        x = np.array([grid.digits(i) for i in indexes]) / scale
+        y = np.array([self.values[i] for i in indexes])
+        finite = np.isfinite(y)
+        if not finite.any():
+            return []
+        y[~finite] = y[finite].min()
+        self._update_radius(y.max(), scale.max())
+
+        steps = self._rng.uniform(
+            -self._radius, self._radius, (self.candidates, len(sizes))
+        )
+        digits = np.clip(np.rint((x[y.argmax()] + steps) * scale), 0, scale)
+        digits = np.unique(digits.astype(int), axis=0)
+        new = [grid.index(d) not in self.values for d in digits]
+        digits = digits[new]
+        if not len(digits):
+            return []
+        # kernel regression with the width of the region
+        distances = ((digits[:, None] / scale - x[None]) ** 2).sum(axis=2)
+        weights = np.exp(-distances / (2 * self._radius ** 2))
+        total = weights.sum(axis=1)
+        mean = np.where(
+            total > 1e-12, weights @ y / np.maximum(total, 1e-12), y.mean()
+        )
+        uncertainty = y.std() * (1 - weights.max(axis=1))
+        return [grid.index(digits[np.argmax(mean + self.kappa * uncertainty)])]
+
+
+class GeneticSearch(BudgetSearch):
+    """Evolutionary search.
+
+    The best `population` backtested variants are the parents of the next
+    generation. A child takes the value of each parameter from one of
+    two parents (each one is the best of two random parents) and it's
+    changed (to a random or a neighboring value) with the probability
+    of `mutation`.
+    """
+
+    def __init__(self, budget=200, population=20, mutation=0.2, seed=0):
+        super().__init__(budget, seed)
+        self.population = population
+        self.mutation = mutation
+
+    def _parent(self, parents):
+        return parents[min(self._rng.randint(len(parents), size=2))]
+
+    def _propose(self, grid):
+        if len(self.values) < self.population:
+            return self._random(grid, self.population - len(self.values))
+        parents = sorted(self.values, key=lambda i: (-self.values[i], i))
+        parents = [grid.digits(i) for i in parents[: self.population]]
+        sizes = grid.sizes
+        children = []
+        for _ in range(self.population):
+            first, second = self._parent(parents), self._parent(parents)
+            child = [
+                a if self._rng.rand() < 0.5 else b
+                for a, b in zip(first, second)
+            ]
+            for k, size in enumerate(sizes):
+                if self._rng.rand() >= self.mutation:
+                    continue
+                if self._rng.rand() < 0.5:
+                    child[k] = self._rng.randint(size)
+                else:
+                    step = 1 if self._rng.rand() < 0.5 else -1
+                    child[k] = min(max(child[k] + step, 0), size - 1)
+            children.append(grid.index(child))
+        return children
+
+
+def _strategy_ref(strategy_class):
+    """Return the class or its (file, name) if it can't be pickled.
+
+    Strategies loaded by `strategies_from_file` aren't importable,
+    so the workers load them from the file again.
+    """
+    try:
+        pickle.dumps(strategy_class)
+    except (pickle.PicklingError, AttributeError, TypeError):
+        if getattr(strategy_class, 'filepath', None) is None:
+            raise
+        return strategy_class.filepath, strategy_class.__name__
+    return strategy_class
+
+
+def _load_strategy(ref):
+    if not isinstance(ref, tuple):
+        return ref
+    fpath, name = ref
+    for strategy_class in strategies_from_file(fpath):
+        if strategy_class.__name__ == name:
+            return strategy_class
+    raise ValueError('There is no strategy %s in %s' % (name, fpath))
+
+
+# attributes of a strategy which are made again by the workers
+_LOCAL_ATTRS = ('context', 'htf')
+
+
+def _pack_strategy(strategy):
+    """Return the strategy (its class and attributes) for the workers.
+
+    The workers get a copy of the strategy with all its attributes
+    (e.g. `name` or `chunksize` set for it), but without its context.
+    """
+    state = {
+        key: value
+        for key, value in vars(strategy).items()
+        if key not in _LOCAL_ATTRS
+    }
+    return _strategy_ref(type(strategy)), state
+
+
+def _unpack_strategy(packed, context):
+    ref, state = packed
+    strategy_class = _load_strategy(ref)
+    # like unpickling, `__init__` isn't called for a copy
+    strategy = strategy_class.__new__(strategy_class)
+    strategy.__dict__.update(state)
+    strategy.context = context
+    return strategy
+
+
+def publish_quotes(store, symbols, path):
+    """Save the base quotes of the symbols to files in the path.
+
+    Return {ticker: (file, timeframe)}. The workers memory-map the files,
+    so the quotes are shared by them instead of being copied to each
+    one. Quotes that are already memory-mapped are not saved again.
+    """
+    files = {}
+    for symbol in symbols:
+        quotes = store.get(symbol)
+        fpath = getattr(quotes, 'fpath', None)
+        if fpath is None:
+            fpath = os.path.join(path, '%d.qdom' % len(files))
+            save_quotes(fpath, quotes)
+        files[symbol.ticker] = (fpath, quotes.timeframe)
+    return files
+
+
+# the state of a worker process (see `_init_worker`)
+_worker = {}
+
+
+def _init_worker(
+    packed_strategy, symbols, files, timeframe, balance, leverage, grid, days
+):
+    store = BaseQuotesStore()
+    for symbol in symbols:
+        fpath, quotes_tf = files[symbol.ticker]
+        store.add(symbol, MappedQuotes(fpath, quotes_tf))
+    portfolio = BasePortfolio(balance, leverage, store)
+    portfolio.timeframe = timeframe
+    _worker['portfolio'] = portfolio
+    _worker['strategy'] = _unpack_strategy(
+        packed_strategy, RunContext(portfolio)
+    )
+    _worker['grid'] = grid
+    _worker['days'] = days
+
+
+def _run_chunk(chunk):
+    portfolio, strategy = _worker['portfolio'], _worker['strategy']
+    brief = BriefPerformance(shape=(len(chunk),))
+    brief.days = _worker['days']
+    variants = _worker['grid'].variants(chunk.start, chunk.stop)
+    for i, kwargs in enumerate(variants):
+        portfolio._evaluate(strategy, kwargs, brief, i)
+    return chunk.start, brief
+
+
+@timeit
+def run_parallel(
+    portfolio,
+    strategy,
+    grid,
+    workers=None,
+    chunksize=None,
+    start=0,
+    results=None,
+):
+    """Backtest the variants of the strategy in a pool of processes.
+
+    Only ranges of indexes of the `grid` (`ParamGrid`) are sent to the
+    workers, which make the variants (kwargs of `init`) themselves.
+    Results of the variants from `start` are added to `results`
+    (`TopResults`) if it's set, otherwise they are collected to
+    `portfolio.brief_performance`, which should have a row for each
+    of them. The results are the same as the ones of
+    `BasePortfolio.run_optimization` with one worker.
+    """
+    workers = workers or os.cpu_count()
+    count = len(grid) - start
+    if chunksize is None:
+        # a few chunks per worker to balance the load
+        chunksize = max(1, math.ceil(count / (workers * 4)))
+    brief = portfolio.brief_performance
+    days = portfolio._period_days(strategy)
+    path = tempfile.mkdtemp(prefix='quantdom-')
+    try:
+        initargs = (
+            _pack_strategy(strategy),
+            strategy.symbols,
+            publish_quotes(strategy.context.store, strategy.symbols, path),
+            portfolio.timeframe,
+            portfolio.initial_balance,
+            portfolio.leverage,
+            grid,
+            days,
+        )
+        processes = min(workers, math.ceil(count / chunksize))
+        with multiprocessing.Pool(processes, _init_worker, initargs) as pool:
+            # chunks are returned in order, so only a few of them are
+            # kept in memory at once (the ones finished ahead of time)
+            chunks = pool.imap(_run_chunk, grid.chunks(chunksize, start))
+            for index, rows in chunks:
+                if results is not None:
+                    results.add(rows, index)
+                else:
+                    brief[index - start : index - start + len(rows)] = rows
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+    brief.days = days
@@ -0,0 +1,277 @@
+"""Pending orders."""
+
+from bisect import bisect_left, bisect_right, insort
+from itertools import count
+
+from .portfolio import Order, Position
+from .utils import ActiveProxy
+
+__all__ = ('OrderBook', 'PendingOrder')
+
+
+def _ticker(symbol):
+    return getattr(symbol, 'ticker', symbol)
+
+
+# orders which are triggered when the price rises to their level
+RISING = (Order.BUY_STOP, Order.SELL_LIMIT)
+# position's direction by the type of the pending order
+DIRECTIONS = {
+    Order.BUY_LIMIT: Order.BUY,
+    Order.BUY_STOP: Order.BUY,
+    Order.SELL_LIMIT: Order.SELL,
+    Order.SELL_STOP: Order.SELL,
+}
+
+
+class PendingOrder:
+    """Limit/stop order or a protective level (SL/TP) of a position."""
+
+    __slots__ = (
+        'symbol',
+        'type',
+        'price',
+        'volume',
+        'time',
+        'sl',
+        'tp',
+        'position',
+        'kind',
+        'status',
+    )
+
+    PENDING = 'pending'
+    FILLED = 'filled'
+    CANCELED = 'canceled'
+
+    def __init__(
+        self,
+        symbol,
+        otype,
+        price,
+        volume=None,
+        time=None,
+        sl=None,
+        tp=None,
+        position=None,
+        kind=None,
+    ):
+        self.symbol = symbol
+        self.type = otype
+        self.price = price
+        self.volume = volume
+        self.time = time
+        self.sl = sl
+        self.tp = tp
+        # only for protective levels: the position and 'sl' or 'tp'
+        self.position = position
+        self.kind = kind
+        self.status = self.PENDING
+
+    def __repr__(self):
+        kind = self.kind.upper() if self.kind else self.type.name
+        return '%s/%s/[%.4f]' % (self.status.upper(), kind, self.price)
+
+    @property
+    def is_active(self):
+        if self.status != self.PENDING:
+            return False
+        if self.position is None:
+            return True
+        # the position may be closed or its level changed since
+        return (
+            self.position.status == Position.OPEN
+            and getattr(self.position, self.kind) == self.price
+        )
+
+
+def _is_rising(order):
+    """Whether the order is triggered by a rise of the price."""
+    if order.kind is None:
+        return order.type in RISING
+    # a long position's TP and a short position's SL are above
+    return (order.position.type == Order.BUY) == (order.kind == 'tp')
+
+
+class _Book:
+    """Orders of one direction sorted by the price.
+
+    Orders that are canceled or filled (and levels of the closed positions)
+    are removed from the book, the others that became inactive (e.g. of
+    a position closed bypassing `Order.close`) are skipped when triggered
+    and dropped when the book is compacted.
+    """
+
+    def __init__(self, rising):
+        self.rising = rising
+        self.orders = []
+        self._compact_size = 64
+
+    def __len__(self):
+        return len(self.orders)
+
+    def add(self, order, seq):
+        insort(self.orders, (order.price, seq, order))
+        if len(self.orders) >= self._compact_size:
+            self.orders = [item for item in self.orders if item[2].is_active]
+            self._compact_size = max(64, len(self.orders) * 2)
+
+    def remove(self, order):
+        index = bisect_left(self.orders, (order.price,))
+        while index < len(self.orders) and self.orders[index][0] == order.price:
+            if self.orders[index][2] is order:
+                del self.orders[index]
+                return
+            index += 1
+
+    def pop_triggered(self, high, low):
+        """Remove and return orders within the bar's range.
+
+        Orders are returned in the order the price reaches them.
+        """
+        if self.rising:
+            index = bisect_right(self.orders, (high, float('inf')))
+            triggered = self.orders[:index]
+            del self.orders[:index]
+            return triggered
+        index = bisect_left(self.orders, (low,))
+        triggered = self.orders[index:]
+        del self.orders[index:]
+        return triggered[::-1]
+
+
+class BaseOrderBook:
+    """Pending orders and protective levels (SL/TP) of the positions.
+
+    Orders are kept by the symbol in two books (triggered by a rise or
+    a fall of the price) sorted by the price, so processing a bar only
+    touches the orders within the bar's range. The book is processed
+    before `handle` of the bar, so orders placed by a strategy are
+    processed starting from the next bar. An order is filled at its price
+    or at the open of the bar, if the price gapped over the order.
+    """
+
+    def __init__(self):
+        self._books = {}
+        self._seq = count()
+        # {position: its SL/TP orders}
+        self._levels = {}
+
+    def __len__(self):
+        return sum(len(r) + len(f) for r, f in self._books.values())
+
+    def __bool__(self):
+        # it's checked on every bar, so it should be cheap: books are
+        # removed as soon as there are no orders in them
+        return bool(self._books)
+
+    def clear(self):
+        self._books.clear()
+        self._levels.clear()
+
+    def _add(self, order):
+        books = self._books.get(_ticker(order.symbol))
+        if books is None:
+            books = self._books[_ticker(order.symbol)] = (
+                _Book(rising=True),
+                _Book(rising=False),
+            )
+        books[0 if _is_rising(order) else 1].add(order, next(self._seq))
+        return order
+
+    def _remove(self, order):
+        ticker = _ticker(order.symbol)
+        books = self._books.get(ticker)
+        if books is None:
+            return
+        books[0 if _is_rising(order) else 1].remove(order)
+        if not any(books):
+            del self._books[ticker]
+
+    def place(self, symbol, otype, price, volume, time=None, sl=None, tp=None):
+        """Place a limit or stop order (sl/tp are set to the position)."""
+        if otype not in DIRECTIONS:
+            raise ValueError('%s is not a pending order type' % otype)
+        order = PendingOrder(symbol, otype, price, volume, time, sl, tp)
+        return self._add(order)
+
+    def cancel(self, order):
+        order.status = PendingOrder.CANCELED
+        self._remove(order)
+
+    def protect(self, position):
+        """Add the position's SL/TP (call it again if they're changed)."""
+        self.unprotect(position)
+        otype = Order.SELL if position.type == Order.BUY else Order.BUY
+        levels = []
+        for kind in ('sl', 'tp'):
+            price = getattr(position, kind)
+            if price is None:
+                continue
+            order = PendingOrder(
+                position.symbol,
+                otype,
+                price,
+                position=position,
+                kind=kind,
+            )
+            levels.append(self._add(order))
+        if levels:
+            self._levels[position] = levels
+
+    def unprotect(self, position):
+        """Remove the position's SL/TP (e.g. when it's closed)."""
+        for order in self._levels.pop(position, ()):
+            self._remove(order)
+
+    def process(self, symbol, bar):
+        """Fill the orders triggered by the bar, return the filled ones."""
+        books = self._books.get(_ticker(symbol))
+        if books is None:
+            return []
+        rising, falling = books
+        # assume that the price goes to the nearest extremum first:
+        # open -> low -> high -> close for a bullish bar
+        if bar.close >= bar.open:
+            sides = (falling, rising)
+        else:
+            sides = (rising, falling)
+        filled = []
+        for book in sides:
+            for price, seq, order in book.pop_triggered(bar.high, bar.low):
+                if not order.is_active:
+                    continue
+                if book.rising:
+                    price = max(price, bar.open)
+                else:
+                    price = min(price, bar.open)
+                self._fill(order, price, bar)
+                filled.append(order)
+        if not any(books) and self._books.get(_ticker(symbol)) is books:
+            del self._books[_ticker(symbol)]
+        return filled
+
+    def _fill(self, order, price, bar):
+        order.status = PendingOrder.FILLED
+        if order.position is not None:
+            order.position.exit_name = order.kind.upper()
+            order.position.close(price=price, time=bar.time, id_bar=bar.id)
+            # the other level of the position
+            self.unprotect(order.position)
+            return
+        position = Order.open(
+            symbol=order.symbol,
+            otype=DIRECTIONS[order.type],
+            price=price,
+            volume=order.volume,
+            time=bar.time,
+            sl=order.sl,
+            tp=order.tp,
+            id_bar=bar.id,
+        )
+        order.position = position
+        position.entry_name = order.type.name
+
+
+# order book of the running backtest (see `ActiveProxy.activate`)
+OrderBook = ActiveProxy(BaseOrderBook())
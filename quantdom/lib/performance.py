@@ -6,7 +6,6 @@ from collections import OrderedDict, defaultdict
 
 import numpy as np
 
-from .base import Quotes
 from .const import ANNUAL_PERIOD
 from .utils import fromtimestamp, get_resource_path
 
@@ -75,11 +74,11 @@ class Stats(np.recarray):
         self[col][i].abs = p.profit
         self[col][i].perc = p.profit_perc
 
-        quotes_on_trade = Quotes[p.id_bar_open : p.id_bar_close]
+        quotes_on_trade = p.quotes[p.id_bar_open : p.id_bar_close]
 
         if not quotes_on_trade.size:
             # if position was opened and closed on the last bar
-            quotes_on_trade = Quotes[p.id_bar_open : p.id_bar_close + 1]
+            quotes_on_trade = p.quotes[p.id_bar_open : p.id_bar_close + 1]
 
         kwargs = {
             'low': quotes_on_trade.low.min(),
@@ -128,6 +127,11 @@ class BriefPerformance(np.recarray):
         )
         return self.days
 
+    @staticmethod
+    def calc_year_profit(net_profit_abs, initial_balance, days):
+        gain_factor = (net_profit_abs + initial_balance) / initial_balance
+        return (gain_factor ** (365 / days) - 1) * 100
+
     def add(self, initial_balance, positions, i, kwargs):
         position_count = len(positions)
         profit = np.recarray(
@@ -141,11 +145,13 @@ class BriefPerformance(np.recarray):
         s.net_profit_abs = np.sum(profit.abs)
         s.net_profit_perc = np.sum(profit.perc)
         days = self._days_count(positions)
-        gain_factor = (s.net_profit_abs + initial_balance) / initial_balance
-        s.year_profit = (gain_factor ** (365 / days) - 1) * 100
+        s.year_profit = self.calc_year_profit(
+            s.net_profit_abs, initial_balance, days
+        )
         s.win_average_profit_perc = np.mean(profit.perc[profit.perc > 0])
         s.loss_average_profit_perc = np.mean(profit.perc[profit.perc < 0])
-        s.max_drawdown_abs = profit.abs.min()
+        # a variant may have no trades (e.g. on a short period)
+        s.max_drawdown_abs = profit.abs.min() if position_count else 0
         s.total_trades = position_count
         wins = profit.abs[profit.abs > 0]
         loss = profit.abs[profit.abs < 0]
@@ -296,23 +302,24 @@ class Performance:
             if col.loss_average_profit_abs
             else 0
         )
-        col.sharpe_ratio = annualized_sharpe_ratio(stats)
-        col.sortino_ratio = annualized_sortino_ratio(stats)
+        quotes = positions[0].quotes if positions else None
+        col.sharpe_ratio = annualized_sharpe_ratio(stats, quotes)
+        col.sortino_ratio = annualized_sortino_ratio(stats, quotes)
 
         # TODO:
         col.alpha_ratio = np.nan
         col.beta_ratio = np.nan
 
 
-def day_percentage_returns(stats):
+def day_percentage_returns(stats, quotes=None):
     days = defaultdict(float)
     trade_count = np.count_nonzero(stats)
 
     if trade_count == 1:
         # market position, so returns should based on quotes
         # calculate percentage changes on a list of quotes
-        changes = np.diff(Quotes.close) / Quotes[:-1].close * 100
-        data = np.column_stack((Quotes[1:].time, changes))  # np.c_
+        changes = np.diff(quotes.close) / quotes.close[:-1] * 100
+        data = np.column_stack((quotes.time[1:], changes))  # np.c_
     else:
         # slice `:trade_count` to exclude zero values in long/short columns
         data = stats[['close_time', 'perc']][:trade_count]
@@ -332,17 +339,17 @@ def day_percentage_returns(stats):
     return _returns
 
 
-def annualized_sharpe_ratio(stats):
+def annualized_sharpe_ratio(stats, quotes=None):
     # risk_free = 0
-    returns = day_percentage_returns(stats)
+    returns = day_percentage_returns(stats, quotes)
     return np.sqrt(ANNUAL_PERIOD) * np.mean(returns) / np.std(returns)
 
 
-def annualized_sortino_ratio(stats):
+def annualized_sortino_ratio(stats, quotes=None):
     # http://www.cmegroup.com/education/files/sortino-a-sharper-ratio.pdf
     required_return = 0
-    returns = day_percentage_returns(stats)
-    mask = [returns < required_return]
+    returns = day_percentage_returns(stats, quotes)
+    mask = returns < required_return
     tdd = np.zeros(len(returns))
     tdd[mask] = returns[mask]  # keep only negative values and zeros
     # "or 1" to prevent division by zero, if we don't have negative returns
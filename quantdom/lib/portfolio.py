@@ -1,20 +1,19 @@
 """Portfolio."""
 
-import itertools
 from contextlib import contextmanager
 from enum import Enum, auto
 
 import numpy as np
 
-from .base import Quotes
 from .performance import BriefPerformance, Performance, Stats
-from .utils import fromtimestamp, timeit
+from .store import QuotesStore
+from .utils import ActiveProxy, fromtimestamp, timeit
 
 __all__ = ('Portfolio', 'Position', 'Order')
 
 
 class BasePortfolio:
-    def __init__(self, balance=100_000, leverage=5):
+    def __init__(self, balance=100_000, leverage=5, store=None):
         self._initial_balance = balance
         self.balance = balance
         self.equity = None
@@ -23,6 +22,11 @@ class BasePortfolio:
         # self.currency
         self.leverage = leverage
         self.positions = []
+        # quotes of the traded symbols
+        self.store = QuotesStore if store is None else store
+        self.timeframe = None
+        # quotes which time axis is used for the curves
+        self.quotes = None
 
         self.balance_curve = None
         self.equity_curve = None
@@ -34,6 +38,7 @@ class BasePortfolio:
         self.stats = None
         self.performance = None
         self.brief_performance = None
+        self.top_results = None
 
     def clear(self):
         self.positions.clear()
@@ -47,6 +52,10 @@ class BasePortfolio:
     def initial_balance(self, value):
         self._initial_balance = value
 
+    def get_quotes(self, symbol):
+        """Return quotes of the symbol in the current timeframe."""
+        return self.store.get(symbol, self.timeframe)
+
     def add_position(self, position):
         position.ticket = len(self.positions) + 1
         self.positions.append(position)
@@ -59,64 +68,87 @@ class BasePortfolio:
         return len(self.positions)
 
     def _close_open_positions(self):
-        for p in self.positions:
-            if p.status == Position.OPEN:
-                p.close(
-                    price=Quotes[-1].open, volume=p.volume, time=Quotes[-1].time
-                )
+        # positions change the balance of the active portfolio
+        with Portfolio.activate(self):
+            for p in self.positions:
+                if p.status == Position.OPEN:
+                    p.close(
+                        price=p.quotes[-1].open,
+                        volume=p.volume,
+                        time=p.quotes[-1].time,
+                        id_bar=len(p.quotes) - 1,
+                    )
 
     def _get_market_position(self):
         p = self.positions[0]  # real postions
+        quotes = p.quotes
         p = Position(
             symbol=p.symbol,
             ptype=Order.BUY,
             volume=p.volume,
-            price=Quotes[0].open,
-            open_time=Quotes[0].time,
-            close_price=Quotes[-1].close,
-            close_time=Quotes[-1].time,
-            id_bar_close=len(Quotes) - 1,
+            price=quotes[0].open,
+            open_time=quotes[0].time,
+            close_price=quotes[-1].close,
+            close_time=quotes[-1].time,
+            id_bar_close=len(quotes) - 1,
             status=Position.CLOSED,
+            quotes=quotes,
+            id_bar_open=0,
         )
-        p.profit = p.calc_profit(close_price=Quotes[-1].close)
+        p.profit = p.calc_profit(close_price=quotes[-1].close)
         p.profit_perc = p.profit / self._initial_balance * 100
         return p
 
+    def _position_bars(self, p):
+        """Return bars of the position and their indexes on the curves."""
+        ibars = np.arange(p.id_bar_open, p.id_bar_close)
+        if p.quotes is self.quotes:
+            return ibars, ibars
+        # position on the other symbol (or timeframe)
+        times = p.quotes.time[p.id_bar_open : p.id_bar_close]
+        return ibars, np.searchsorted(self.quotes.time, times)
+
+    def _mark_to_market(self, positions):
+        """Return the profit of the positions at every bar of the curves.
+
+        The profit of the closed positions plus the floating profit of
+        the open ones, at the bars where any position is open (the others
+        are zeros). Positions may overlap (e.g. of several strategies).
+        """
+        size = len(self.quotes.time)
+        curve = np.zeros(size)
+        is_open = np.zeros(size, dtype=bool)
+        # profits of the positions at the bars they are closed on
+        closed = np.zeros(size + 1)
+        for p in positions:
+            ibars, icurve = self._position_bars(p)
+            curve[icurve] += p.calc_profit(close_price=p.quotes.close[ibars])
+            is_open[icurve] = True
+            iclose = np.searchsorted(self.quotes.time, p.close_time)
+            closed[iclose] += p.profit
+        realized = np.cumsum(closed[:size])
+        curve[is_open] += realized[is_open]
+        return curve
+
     def _calc_equity_curve(self):
         """Equity curve."""
-        self.equity_curve = np.zeros_like(Quotes.time)
-        for i, p in enumerate(self.positions):
-            balance = np.sum(self.stats['All'][:i].abs)
-            for ibar in range(p.id_bar_open, p.id_bar_close):
-                profit = p.calc_profit(close_price=Quotes[ibar].close)
-                self.equity_curve[ibar] = balance + profit
+        self.equity_curve = self._mark_to_market(self.positions)
         # taking into account the real balance after the last trade
         self.equity_curve[-1] = self.balance_curve[-1]
 
     def _calc_buy_and_hold_curve(self):
         """Buy and Hold."""
         p = self._get_market_position()
-        self.buy_and_hold_curve = np.array(
-            [p.calc_profit(close_price=price) for price in Quotes.close]
-        )
+        self.buy_and_hold_curve = p.calc_profit(close_price=self.quotes.close)
 
     def _calc_long_short_curves(self):
         """Only Long/Short positions curve."""
-        self.long_curve = np.zeros_like(Quotes.time)
-        self.short_curve = np.zeros_like(Quotes.time)
-
-        for i, p in enumerate(self.positions):
-            if p.type == Order.BUY:
-                name = 'Long'
-                curve = self.long_curve
-            else:
-                name = 'Short'
-                curve = self.short_curve
-            balance = np.sum(self.stats[name][:i].abs)
-            # Calculate equity for this position
-            for ibar in range(p.id_bar_open, p.id_bar_close):
-                profit = p.calc_profit(close_price=Quotes[ibar].close)
-                curve[ibar] = balance + profit
+        self.long_curve = self._mark_to_market(
+            [p for p in self.positions if p.type == Order.BUY]
+        )
+        self.short_curve = self._mark_to_market(
+            [p for p in self.positions if p.type == Order.SELL]
+        )
 
         for name, curve in [
             ('Long', self.long_curve),
@@ -147,24 +179,99 @@ class BasePortfolio:
         self.positions = self.backup_positions.copy()
         self.backup_positions.clear()
 
+    def _check_strategy(self, strategy):
+        if strategy.context.portfolio is not self:
+            raise ValueError(
+                '%s trades in the portfolio of its context, not in this one'
+                % strategy.name
+            )
+
+    def _period_days(self, strategy):
+        """Return days of the quotes the strategy is backtested on.
+
+        The year profit of all variants of an optimization is calculated
+        for this period (whatever part of it a variant is run on).
+        """
+        time = strategy.quotes.time
+        if not len(time):
+            return 1
+        days = (fromtimestamp(time[-1]) - fromtimestamp(time[0])).days
+        return max(days, 1)
+
+    def _evaluate(self, strategy, kwargs, brief, i):
+        """Backtest a variant of the parameters, add its results to brief."""
+        self._check_strategy(strategy)
+        strategy.start(**kwargs)
+        self._close_open_positions()
+        brief.add(self._initial_balance, self.positions, i, kwargs)
+        self.clear()
+
     @timeit
-    def run_optimization(self, strategy, params):
-        keys = list(params.keys())
-        vals = list(params.values())
-        variants = list(itertools.product(*vals))
-        self.brief_performance = BriefPerformance(shape=(len(variants),))
-        with self.optimization_mode():
-            for i, vals in enumerate(variants):
-                kwargs = {keys[n]: val for n, val in enumerate(vals)}
-                strategy.start(**kwargs)
-                self._close_open_positions()
-                self.brief_performance.add(
-                    self._initial_balance, self.positions, i, kwargs
-                )
-                self.clear()
+    def run_optimization(
+        self,
+        strategy,
+        params,
+        workers=1,
+        start=0,
+        top=None,
+        objective='net_profit_abs',
+        search=None,
+    ):
+        """Backtest every combination of the params values.
+
+        Combinations are made on the fly (see `ParamGrid`), `start` is
+        the index of the first one (to resume an optimization). If
+        `workers` isn't 1, they are run in that many processes
+        (None - as many as there are CPUs), see `run_parallel`.
+        If `top` is set, only that many best results by the `objective`
+        are kept in `brief_performance`, statistics of all of them are
+        in `top_results` (see `TopResults`). `search` (`RandomSearch`,
+        `BayesianSearch`, `GeneticSearch`, `SuccessiveHalving`) backtests
+        only some of the combinations (then `workers` and `top` aren't
+        used).
+        """
+        from .optimization import ParamGrid, TopResults, run_parallel
+
+        # the results are of the portfolio the strategy trades in
+        self._check_strategy(strategy)
+        grid = ParamGrid(params)
+        if search is not None:
+            self.top_results = None
+            self.brief_performance = search.run(self, strategy, grid, objective)
+            return
+        count = max(0, len(grid) - start)
+        self.top_results = None
+        if top is None:
+            self.brief_performance = BriefPerformance(shape=(count,))
+            brief = self.brief_performance
+        else:
+            self.top_results = TopResults(top, objective)
+            # the results of one variant at a time
+            self.brief_performance = brief = BriefPerformance(shape=(1,))
+        brief.days = self._period_days(strategy)
+        if workers != 1 and count > 1:
+            run_parallel(
+                self,
+                strategy,
+                grid,
+                workers=workers,
+                start=start,
+                results=self.top_results,
+            )
+        else:
+            with self.optimization_mode():
+                for i, kwargs in enumerate(grid.variants(start)):
+                    if top is None:
+                        self._evaluate(strategy, kwargs, brief, i)
+                        continue
+                    self._evaluate(strategy, kwargs, brief, 0)
+                    self.top_results.add(brief, start + i)
+        if top is not None:
+            self.brief_performance = self.top_results.brief_performance()
 
     @timeit
     def summarize(self):
+        self.quotes = self.positions[0].quotes
         self._close_open_positions()
         positions = {
             'All': self.positions,
@@ -179,7 +286,8 @@ class BasePortfolio:
         self._calc_curves()
 
 
-Portfolio = BasePortfolio()
+# portfolio of the running backtest (see `ActiveProxy.activate`)
+Portfolio = ActiveProxy(BasePortfolio())
 
 
 class PositionStatus(Enum):
@@ -211,6 +319,7 @@ class Position:
         'commis',
         'id_bar_open',
         'id_bar_close',
+        'quotes',
         'entry_name',
         'exit_name',
         'total_profit',
@@ -230,6 +339,8 @@ class Position:
         entry_name='',
         exit_name='',
         comment='',
+        quotes=None,
+        id_bar_open=None,
         **kwargs,
     ):
         self.type = ptype
@@ -246,7 +357,9 @@ class Position:
         self.profit = None
         self.profit_perc = None
         self.commis = None
-        self.id_bar_open = np.where(Quotes.time == self.open_time)[0][0]
+        # quotes (of the position's symbol) that the position is traded on
+        self.quotes = Portfolio.get_quotes(symbol) if quotes is None else quotes
+        self.id_bar_open = self.quotes.bar_index(open_time, id_bar_open)
         self.id_bar_close = None
         self.entry_name = entry_name
         self.exit_name = exit_name
@@ -268,11 +381,11 @@ class Position:
             self.open_price,
         )
 
-    def close(self, price, time, volume=None):
+    def close(self, price, time, volume=None, id_bar=None):
         # TODO: allow closing only part of the volume
         self.close_price = price
         self.close_time = time
-        self.id_bar_close = np.where(Quotes.time == self.close_time)[0][0]
+        self.id_bar_close = self.quotes.bar_index(time, id_bar)
         self.profit = self.calc_profit(volume=volume or self.volume)
         self.profit_perc = self.profit / Portfolio.balance * 100
 
@@ -283,7 +396,9 @@ class Position:
 
     def calc_profit(self, volume=None, close_price=None):
         # TODO: rewrite it
-        close_price = close_price or self.close_price
+        # `close_price` may be an array of prices (e.g. to calculate a curve)
+        if close_price is None:
+            close_price = self.close_price
         volume = volume or self.volume
         factor = 1 if self.type == Order.BUY else -1
         price_delta = (close_price - self.open_price) * factor
@@ -380,7 +495,9 @@ class Order:
     SELL_STOP = OrderType.SELL_STOP
 
     @staticmethod
-    def open(symbol, otype, price, volume, time, sl=None, tp=None):
+    def open(
+        symbol, otype, price, volume, time, sl=None, tp=None, id_bar=None
+    ):
         # TODO: add margin calculation
         # and if the margin is not enough - do not open the position
         position = Position(
@@ -391,15 +508,24 @@ class Order:
             open_time=time,
             sl=sl,
             tp=tp,
+            id_bar_open=id_bar,
         )
         Portfolio.add_position(position)
+        if sl is not None or tp is not None:
+            from .orders import OrderBook
+
+            OrderBook.protect(position)
         return position
 
     @staticmethod
-    def close(position, price, time, volume=None):
+    def close(position, price, time, volume=None, id_bar=None):
         # FIXME: may be closed not the whole volume, but
         # the position status will be changed to CLOSED
-        position.close(price=price, time=time, volume=volume)
+        position.close(price=price, time=time, volume=volume, id_bar=id_bar)
+        if position.sl is not None or position.tp is not None:
+            from .orders import OrderBook
+
+            OrderBook.unprotect(position)
 
 
 def fill_zeros_with_last(arr):
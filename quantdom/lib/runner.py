@@ -0,0 +1,95 @@
+"""Running several strategies at once."""
+
+from .context import DefaultContext
+from .engine import iter_bars
+from .orders import OrderBook
+from .portfolio import Portfolio
+from .strategy import VectorizedStrategy
+from .utils import timeit
+
+__all__ = ('combine_portfolios', 'run_strategies')
+
+
+def combine_portfolios(portfolios):
+    """Return the portfolio with positions of all the portfolios."""
+    combined = DefaultContext.clone(
+        balance=sum(p.initial_balance for p in portfolios)
+    ).portfolio
+    combined.balance = sum(p.balance for p in portfolios)
+    combined.positions = sorted(
+        (p for portfolio in portfolios for p in portfolio.positions),
+        key=lambda p: p.open_time,
+    )
+    if combined.positions:
+        combined.summarize()
+    return combined
+
+
+def _run(strategies):
+    quotes = None
+    handlers = []
+    chunksizes = []
+    for strategy in strategies:
+        context = strategy.context
+        if isinstance(strategy, VectorizedStrategy) or strategy.multi_symbol:
+            strategy.start()
+            continue
+        with context.activate():
+            strategy.setup()
+        if quotes is None:
+            quotes = strategy.quotes
+        elif strategy.quotes is not quotes:
+            raise ValueError(
+                '%s trades other quotes than the others' % strategy.name
+            )
+        handlers.append((strategy.symbol, strategy.handle, context))
+        if strategy.chunksize is not None:
+            chunksizes.append(strategy.chunksize)
+    if not handlers:
+        return
+    # the bars are shared, so they are converted by the smallest chunks
+    chunksize = min(chunksizes) if chunksizes else None
+    previous = Portfolio.current(), OrderBook.current()
+    try:
+        for bar in iter_bars(quotes, chunksize):
+            for symbol, handle, context in handlers:
+                context.set_current()
+                if context.orders:
+                    context.orders.process(symbol, bar)
+                handle(bar)
+    finally:
+        Portfolio.set_current(previous[0])
+        OrderBook.set_current(previous[1])
+
+
+@timeit
+def run_strategies(strategies):
+    """Backtest the strategies in one pass over the bars.
+
+    Each strategy trades in its own context, so the strategies don't
+    affect each other. Strategies with the `DefaultContext` trade in new
+    contexts (with the same settings) during the run. The strategies
+    should trade the same symbol. The bars go by the smallest `chunksize`
+    of the strategies. Vectorized strategies don't go through the bars,
+    so they are run one by one. Return the (summarized)
+    portfolios of the strategies and the portfolio combined of all
+    of them.
+    """
+    contexts = [
+        DefaultContext.clone() if s.context is DefaultContext else s.context
+        for s in strategies
+    ]
+    previous_contexts = [strategy.context for strategy in strategies]
+    try:
+        for strategy, context in zip(strategies, contexts):
+            strategy.context = context
+        _run(strategies)
+    finally:
+        for strategy, context in zip(strategies, previous_contexts):
+            strategy.context = context
+
+    portfolios = [context.portfolio for context in contexts]
+    for portfolio in portfolios:
+        if portfolio.positions:
+            portfolio.summarize()
+    return portfolios, combine_portfolios(portfolios)
@@ -0,0 +1,279 @@
+"""Storage."""
+
+import json
+import os
+import os.path
+import struct
+
+import numpy as np
+
+from .base import BaseQuotes
+from .const import TimeFrame
+
+__all__ = (
+    'MappedQuotes',
+    'QuotesCache',
+    'QuotesFileError',
+    'is_quotes_file',
+    'load_quotes',
+    'save_quotes',
+)
+
+
+MAGIC = b'QDOM'
+VERSION = 1
+# magic, format version, length of the json header
+PREFIX = struct.Struct('<4sHI')
+# columns are aligned to the cache line size
+ALIGNMENT = 64
+# `id` is just a bar number, so it's not stored and restored on loading
+COLUMNS = ('time', 'open', 'high', 'low', 'close', 'volume')
+
+
+class QuotesFileError(Exception):
+    pass
+
+
+def _align(offset):
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def is_quotes_file(fpath):
+    with open(fpath, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_quotes(fpath, quotes, meta=None, columns=COLUMNS):
+    """Save quotes to a file as contiguous arrays (one per column).
+
+    Layout: prefix | json header | column | column | ...
+    The header contains the number of rows, a dtype and an offset of each
+    column (relative to the end of the header), so the columns can be
+    memory-mapped without reading the whole file.
+    """
+    names, columns = columns, [
+        np.ascontiguousarray(quotes[name]) for name in columns
+    ]
+    meta = dict(meta or {})
+    if getattr(quotes, 'timeframe', None):
+        meta.setdefault('timeframe', quotes.timeframe.name)
+    header = {'length': len(columns[0]), 'columns': [], 'meta': meta}
+    offset = 0
+    for name, column in zip(names, columns):
+        header['columns'].append([name, column.dtype.str, offset])
+        offset = _align(offset + column.nbytes)
+    raw_header = json.dumps(header).encode('utf-8')
+    data_start = _align(PREFIX.size + len(raw_header))
+
+    tmp_path = '%s.tmp' % fpath
+    with open(tmp_path, 'wb') as f:
+        f.write(PREFIX.pack(MAGIC, VERSION, len(raw_header)))
+        f.write(raw_header)
+        for (name, dtype, offset), column in zip(header['columns'], columns):
+            f.seek(data_start + offset)
+            f.write(column.tobytes())
+    # don't leave a half-written file if something went wrong
+    os.replace(tmp_path, fpath)
+
+
+def load_quotes(fpath, mmap=True):
+    """Return a header meta and a dict of columns of the quotes file.
+
+    If `mmap` is true, the columns are read-only memory maps of the file,
+    so the data is read from the disk only on access.
+    """
+    with open(fpath, 'rb') as f:
+        magic, version, header_len = PREFIX.unpack(f.read(PREFIX.size))
+        if magic != MAGIC:
+            raise QuotesFileError('%s is not a quotes file' % fpath)
+        if version > VERSION:
+            raise QuotesFileError(
+                'Unsupported version of the quotes file: %d' % version
+            )
+        header = json.loads(f.read(header_len).decode('utf-8'))
+        length = header['length']
+        data_start = _align(PREFIX.size + header_len)
+        columns = {}
+        for name, dtype, offset in header['columns']:
+            dtype = np.dtype(dtype)
+            offset += data_start
+            if not mmap or not length:
+                f.seek(offset)
+                columns[name] = np.fromfile(f, dtype=dtype, count=length)
+            else:
+                columns[name] = np.memmap(
+                    fpath, dtype=dtype, mode='r', offset=offset, shape=(length,)
+                )
+    return header['meta'], columns
+
+
+class MappedQuotes:
+    """Read-only quotes backed by the memory-mapped columns of a file.
+
+    The bars are read from the disk only on access, so the quotes may be
+    larger than RAM. An int index returns a bar, a slice returns
+    `BaseQuotes` (a copy of the bars), `chunks` and iteration go through
+    the quotes by chunks of `chunksize` bars.
+    """
+
+    chunksize = 100_000
+
+    def __init__(self, fpath, timeframe=None):
+        self.fpath = fpath
+        self.meta, self._columns = load_quotes(fpath, mmap=True)
+        if timeframe is None and self.meta.get('timeframe'):
+            timeframe = TimeFrame[self.meta['timeframe']]
+        self.timeframe = timeframe
+
+    def __len__(self):
+        return len(self._columns['time'])
+
+    @property
+    def size(self):
+        return len(self)
+
+    @property
+    def id(self):
+        return np.arange(len(self))
+
+    def __getattr__(self, name):
+        if name in COLUMNS:
+            return self._columns[name]
+        raise AttributeError(name)
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return getattr(self, key)
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return self._bars(0, len(self))[key]
+            return self._bars(start, max(start, stop))
+        index = key + len(self) if key < 0 else key
+        if not 0 <= index < len(self):
+            raise IndexError(key)
+        return self._bars(index, index + 1)[0]
+
+    bar_index = BaseQuotes.bar_index
+
+    def __iter__(self):
+        for chunk in self.chunks():
+            yield from chunk
+
+    def _bars(self, start, stop):
+        quotes = BaseQuotes(shape=(stop - start,))
+        quotes.id = np.arange(start, stop)
+        for name in COLUMNS:
+            quotes[name] = self._columns[name][start:stop]
+        quotes.timeframe = self.timeframe
+        return quotes
+
+    def chunks(self, size=None):
+        """Yield consecutive chunks of the quotes (as `BaseQuotes`)."""
+        size = size or self.chunksize
+        for start in range(0, len(self), size):
+            yield self._bars(start, min(start + size, len(self)))
+
+
+def _merge_ranges(ranges):
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    return merged
+
+
+def _missing_ranges(ranges, start, end):
+    """Return parts of the [start, end) range that aren't covered."""
+    gaps = []
+    for r_start, r_end in ranges:
+        if r_end <= start:
+            continue
+        if r_start >= end:
+            break
+        if r_start > start:
+            gaps.append([start, r_start])
+        start = max(start, r_end)
+    if start < end:
+        gaps.append([start, end])
+    return gaps
+
+
+def _concat_columns(parts):
+    """Concatenate columns; on duplicate time the first part wins."""
+    columns = {
+        name: np.concatenate([part[name] for part in parts])
+        for name in COLUMNS
+    }
+    _, index = np.unique(columns['time'], return_index=True)
+    return {name: column[index] for name, column in columns.items()}
+
+
+class QuotesCache:
+    """Per symbol/timeframe store of quotes.
+
+    Every file knows the time ranges that have already been requested,
+    so any window inside them is served by slicing and only the missing
+    gaps are requested from a loader and merged into the file.
+    Caches of the previous versions (pickled quotes) aren't read, their
+    quotes are requested again and saved in the new format.
+    """
+
+    name_format = '%(symbol)s_%(tf)s.%(ext)s'
+
+    def __init__(self, path):
+        self.path = path
+
+    def _get_file_path(self, symbol, tf):
+        fname = self.name_format % {'symbol': symbol, 'tf': tf, 'ext': 'qdom'}
+        return os.path.join(self.path, fname)
+
+    def _load(self, fpath):
+        if not os.path.exists(fpath) or not is_quotes_file(fpath):
+            return {'ranges': []}, None
+        return load_quotes(fpath, mmap=True)
+
+    def ranges(self, symbol, tf):
+        """Return the time ranges covered by the cache."""
+        meta, _ = self._load(self._get_file_path(symbol, tf))
+        return meta['ranges']
+
+    def get(self, symbol, tf, start, end, fetch, complete_before=None):
+        """Return columns of the quotes within the [start, end) range.
+
+        `fetch(start, end)` is called for every missing gap and should
+        return quotes (or None if there is no data). Ranges after
+        `complete_before` (e.g. the current day) are fetched again
+        next time, since the data for them may be incomplete yet.
+        """
+        fpath = self._get_file_path(symbol, tf)
+        meta, columns = self._load(fpath)
+        ranges = meta['ranges']
+        gaps = _missing_ranges(ranges, start, end)
+        if gaps:
+            parts = []
+            for gap_start, gap_end in gaps:
+                quotes = fetch(gap_start, gap_end)
+                if quotes is not None and len(quotes):
+                    parts.append({name: quotes[name] for name in COLUMNS})
+                if complete_before is not None:
+                    gap_end = min(gap_end, complete_before)
+                if gap_start < gap_end:
+                    ranges = _merge_ranges(ranges + [[gap_start, gap_end]])
+            if columns is not None:
+                parts.append(columns)
+            if parts:
+                columns = _concat_columns(parts)
+            # release the memory maps before the file will be replaced
+            del parts
+            meta['ranges'] = ranges
+            if columns is not None:
+                save_quotes(fpath, columns, meta=meta)
+                meta, columns = load_quotes(fpath, mmap=True)
+
+        if columns is None:
+            return {name: np.empty(0) for name in COLUMNS}
+        lo, hi = np.searchsorted(columns['time'], [start, end])
+        return {name: column[lo:hi] for name, column in columns.items()}
@@ -0,0 +1,91 @@
+"""Quotes store."""
+
+import numpy as np
+
+from .base import Quotes
+from .timeframes import ResampleCache
+
+__all__ = ('QuotesStore',)
+
+
+def _ticker(symbol):
+    return getattr(symbol, 'ticker', symbol)
+
+
+class BaseQuotesStore:
+    """Quotes of many symbols by (symbol, timeframe).
+
+    The first quotes added for a symbol are its base quotes, quotes
+    of the higher timeframes are resampled from them on demand.
+    If a symbol isn't in the store, `default` quotes are returned
+    (if they are set), so the single-symbol mode keeps working.
+    """
+
+    def __init__(self, default=None):
+        self.default = default
+        self._quotes = {}
+        self._resampled = ResampleCache()
+        self._time_index = {}
+
+    def __contains__(self, symbol):
+        return _ticker(symbol) in self._quotes
+
+    def __len__(self):
+        return len(self._quotes)
+
+    @property
+    def symbols(self):
+        return list(self._quotes)
+
+    def add(self, symbol, quotes):
+        """Add (or replace) the base quotes of the symbol."""
+        ticker = _ticker(symbol)
+        self._quotes[ticker] = quotes
+        self._resampled.clear(ticker)
+        self._time_index.clear()
+
+    def remove(self, symbol):
+        ticker = _ticker(symbol)
+        del self._quotes[ticker]
+        self._resampled.clear(ticker)
+        self._time_index.clear()
+
+    def clear(self):
+        self._quotes.clear()
+        self._resampled.clear()
+        self._time_index.clear()
+
+    def get(self, symbol, timeframe=None):
+        ticker = _ticker(symbol)
+        quotes = self._quotes.get(ticker)
+        if quotes is None:
+            if self.default is None:
+                raise KeyError(ticker)
+            quotes = self.default
+        if timeframe is None or timeframe == quotes.timeframe:
+            return quotes
+        if quotes.timeframe and timeframe.value < quotes.timeframe.value:
+            raise ValueError(
+                'Quotes of %s can not be converted from %s to %s'
+                % (ticker, quotes.timeframe.name, timeframe.name)
+            )
+        return self._resampled.get(ticker, quotes, timeframe)
+
+    def time_index(self, timeframe=None):
+        """Return a sorted union of the time of all symbols' quotes."""
+        if timeframe not in self._time_index:
+            times = [
+                self.get(symbol, timeframe).time for symbol in self._quotes
+            ]
+            self._time_index[timeframe] = (
+                np.unique(np.concatenate(times)) if times else np.empty(0)
+            )
+        return self._time_index[timeframe]
+
+    def align(self, symbol, timeframe=None):
+        """Return positions of the symbol's bars in the `time_index`."""
+        quotes = self.get(symbol, timeframe)
+        return np.searchsorted(self.time_index(timeframe), quotes.time)
+
+
+QuotesStore = BaseQuotesStore(default=Quotes)
@@ -4,23 +4,47 @@ import inspect
 import logging
 from abc import ABC, abstractmethod
 
-from .base import Quotes
+from .context import DefaultContext
+from .engine import (
+    HigherTimeframe,
+    execute_signals,
+    iter_bar_slices,
+    iter_bars,
+    run_kernel,
+)
 from .utils import timeit
 
-__all__ = ('AbstractStrategy',)
+__all__ = ('AbstractStrategy', 'CompiledStrategy', 'VectorizedStrategy')
 
 
 logger = logging.getLogger(__name__)
 
 
 class AbstractStrategy(ABC):
-    def __init__(self, name=None, period=None, symbols=None):
+
+    # if it's set, quotes are passed to `handle` by chunks of that many bars
+    # (of each symbol), so quotes that don't fit in memory (see
+    # `MappedQuotes`) are never loaded at once. Portfolio and the strategy's
+    # own state are kept between chunks, so the result is the same as
+    # without chunks. Note that `Portfolio.summarize` still makes curves
+    # with a value for every bar (and the higher `timeframes` are loaded
+    # at once), so they take memory in proportion to the number of bars.
+    chunksize = None
+    # if it's set, `handle` gets bars of all `symbols` at the same time
+    # (see `BarSlice`) instead of bars of the first symbol
+    multi_symbol = False
+    # higher timeframes the strategy uses, they're available as
+    # `self.htf[timeframe]` (see `HigherTimeframe`)
+    timeframes = ()
+
+    def __init__(self, name=None, period=None, symbols=None, context=None):
         self.name = name or self.__class__.__name__
         self.period = period
         # it comes a list of symbols. temporary we support only the first one
         self.symbols = symbols
         self.symbol = symbols[0]
-        # deposit ?
+        # portfolio and order book which the strategy trades (`RunContext`)
+        self.context = DefaultContext if context is None else context
 
     @classmethod
     def get_name(cls):
@@ -31,14 +55,64 @@ class AbstractStrategy(ABC):
         logger.debug('Starting backtest of strategy: %s', self.name)
         self.start()
         logger.debug('Backtest is done.')
-        args = inspect.getfullargspec(self.init).args[1:]
-        defaults = inspect.getfullargspec(self.init).defaults
+        spec = inspect.getfullargspec(self.init)
+        defaults = spec.defaults or ()
+        # only the last arguments have the default values
+        args = spec.args[len(spec.args) - len(defaults) :]
         self.kwargs = dict(zip(args, defaults))
 
-    def start(self, *args, **kwargs):
+    @property
+    def quotes(self):
+        """Quotes of the (first) symbol from the portfolio's store."""
+        return self.context.portfolio.get_quotes(self.symbol)
+
+    def _init_timeframes(self):
+        quotes = self.quotes
+        htf = getattr(self, 'htf', {})
+        for tf in self.timeframes:
+            # reuse them between the runs (e.g. variants of optimization)
+            if tf not in htf or htf[tf].base is not quotes:
+                higher = self.context.store.get(self.symbol, tf)
+                htf[tf] = HigherTimeframe(quotes, higher)
+        self.htf = htf
+
+    def setup(self, *args, **kwargs):
+        """Prepare the strategy to get the bars (it calls `init`)."""
+        self.context.orders.clear()
+        self._init_timeframes()
         self.init(*args, **kwargs)
-        for quote in Quotes:
-            self.handle(quote)
+
+    def start(self, *args, **kwargs):
+        with self.context.activate():
+            self.setup(*args, **kwargs)
+            self._execute()
+
+    def _execute(self):
+        if self.multi_symbol:
+            self._execute_multi_symbol()
+            return
+        handle = self.handle
+        orders = self.context.orders
+        for bar in iter_bars(self.quotes, self.chunksize):
+            if orders:
+                # pending orders and SL/TP of the positions
+                orders.process(self.symbol, bar)
+            handle(bar)
+
+    def _execute_multi_symbol(self):
+        handle = self.handle
+        orders = self.context.orders
+        symbols = {symbol.ticker: symbol for symbol in self.symbols}
+        quotes = {
+            ticker: self.context.portfolio.get_quotes(symbol)
+            for ticker, symbol in symbols.items()
+        }
+        for bars in iter_bar_slices(quotes, self.chunksize):
+            if orders:
+                for ticker, bar in bars:
+                    if bar is not None and not bar.missing:
+                        orders.process(symbols[ticker], bar)
+            handle(bars)
 
     @abstractmethod
     def init(self):
@@ -50,4 +124,74 @@ class AbstractStrategy(ABC):
 
     @abstractmethod
     def handle(self, quote):
-        """Called for each iteration (on every bar received)."""
+        """Called for each iteration (on every bar received).
+
+        * quote - `Bar` (the same object for every bar)
+          or `BarSlice` if the strategy is `multi_symbol`.
+        """
+
+
+class VectorizedStrategy(AbstractStrategy):
+    """Strategy which signals are calculated for all bars at once.
+
+    `init` should set boolean arrays (with a value for every bar of
+    `quotes`) of the signals it uses: `long_entries`, `short_entries`,
+    `exits`. Orders are executed at the open of the bar following
+    the signal, an entry in the opposite direction reverses the position.
+    """
+
+    # volume of the positions
+    volume = 1
+
+    def setup(self, *args, **kwargs):
+        self.long_entries = self.short_entries = self.exits = None
+        super().setup(*args, **kwargs)
+
+    def _execute(self):
+        execute_signals(
+            self.symbol,
+            self.quotes,
+            self.volume,
+            self.long_entries,
+            self.short_entries,
+            self.exits,
+        )
+
+    def handle(self, quote):
+        """Not used, signals are set in `init`."""
+
+
+class CompiledStrategy(VectorizedStrategy):
+    """Strategy which bar by bar logic is compiled (if numba is installed).
+
+    `kernel` is a static method, which goes through the bars and sets
+    the signals (see `run_kernel`), its state is kept in local variables
+    (numbers or arrays). `init` should set `kernel_args` - the additional
+    arguments of the kernel (e.g. the parameters of the strategy).
+    Orders are executed like in `VectorizedStrategy`. Without numba
+    the kernel is run by the interpreter with the same results.
+    """
+
+    # compile the kernel
+    jit = True
+
+    @staticmethod
+    @abstractmethod
+    def kernel(signals, time, open, high, low, close, volume, *args):
+        """Called once with all bars of the quotes."""
+
+    def setup(self, *args, **kwargs):
+        self.kernel_args = ()
+        super().setup(*args, **kwargs)
+
+    def _execute(self):
+        signals = run_kernel(
+            self.kernel, self.quotes, self.kernel_args, jit=self.jit
+        )
+        execute_signals(
+            self.symbol,
+            self.quotes,
+            self.volume,
+            long_entries=signals == 1,
+            short_entries=signals == -1,
+        )
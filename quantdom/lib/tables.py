@@ -191,6 +191,11 @@ class TradesTable(QtGui.QTableWidget):
 class OptimizationTable(QtGui.QTableWidget):
 
     cols = ('Variable', 'Value', 'Minimum', 'Maximum', 'Step', 'Optimize')
+    # only the best results (by net profit) are kept and shown
+    max_results = 1000
+    # processes running the variants (None - as many as there are CPUs),
+    # the backtests are run in the GUI process by default
+    workers = 1
 
     def __init__(self):
         super().__init__()
@@ -237,9 +242,15 @@ class OptimizationTable(QtGui.QTableWidget):
             params[var] = np.arange(_min, _max, _step)
         return params
 
-    def optimize(self, *args, **kwargs):
+    def optimize(self, search=None):
         params = self._get_params()
-        Portfolio.run_optimization(self.strategy, params)
+        Portfolio.run_optimization(
+            self.strategy,
+            params,
+            workers=self.workers,
+            top=self.max_results,
+            search=search,
+        )
 
 
 class OptimizatimizedResultsTable(QtGui.QTableWidget):
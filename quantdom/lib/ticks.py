@@ -0,0 +1,200 @@
+"""Ticks."""
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import is_numeric_dtype
+
+from .base import BaseQuotes, QuotesBuffer
+from .storage import load_quotes, save_quotes
+from .timeframes import bucket_keys, bucket_times
+
+__all__ = ('BarBuilder', 'TickStore', 'read_ticks')
+
+
+TICK_COLUMNS = (('time', float), ('price', float), ('size', int))
+QUOTE_COLUMNS = (('bid', float), ('ask', float))
+
+
+def read_ticks(fpath, chunksize=1_000_000, with_quotes=False, **kwargs):
+    """Yield chunks (dicts of columns) of ticks from a csv file.
+
+    The file should have `time`, `price`, `size` columns (and `bid`, `ask`
+    if `with_quotes` is true), the time is either a timestamp or a date
+    string. `kwargs` are passed to `pd.read_csv`.
+    """
+    columns = TICK_COLUMNS + (QUOTE_COLUMNS if with_quotes else ())
+    for frame in pd.read_csv(fpath, chunksize=chunksize, **kwargs):
+        chunk = {}
+        for name, dtype in columns:
+            values = frame[name]
+            if name == 'time' and not is_numeric_dtype(values):
+                values = BaseQuotes.convert_dates(values)
+            chunk[name] = np.asarray(values, dtype=dtype)
+        yield chunk
+
+
+class TickStore:
+    """Ticks (time, price, size and optionally bid/ask) in typed arrays.
+
+    Ticks are appended in chunks into preallocated arrays, that grow
+    by `growth_factor` when they are full.
+    """
+
+    growth_factor = 2
+
+    def __init__(self, with_quotes=False, capacity=1_000_000):
+        self.with_quotes = with_quotes
+        self.dtypes = TICK_COLUMNS + (QUOTE_COLUMNS if with_quotes else ())
+        self._data = {
+            name: np.empty(capacity, dtype=dtype) for name, dtype in self.dtypes
+        }
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, name):
+        return self._data[name][: self._size]
+
+    @property
+    def columns(self):
+        return tuple(name for name, dtype in self.dtypes)
+
+    def append(self, chunk):
+        """Append ticks (a dict of columns)."""
+        size = len(chunk['time'])
+        start, end = self._size, self._size + size
+        capacity = len(self._data['time'])
+        if end > capacity:
+            capacity = max(end, int(capacity * self.growth_factor))
+            for name, column in self._data.items():
+                data = np.empty(capacity, dtype=column.dtype)
+                data[:start] = column[:start]
+                self._data[name] = data
+        for name in self.columns:
+            self._data[name][start:end] = chunk[name]
+        self._size = end
+
+    def chunks(self, size=1_000_000):
+        """Yield ticks by chunks (dicts of views of the columns)."""
+        for start in range(0, self._size, size):
+            yield {
+                name: self[name][start : start + size] for name in self.columns
+            }
+
+    @classmethod
+    def from_csv(cls, fpath, with_quotes=False, **kwargs):
+        """Load ticks from a csv file chunk by chunk (see `read_ticks`)."""
+        ticks = cls(with_quotes=with_quotes)
+        for chunk in read_ticks(fpath, with_quotes=with_quotes, **kwargs):
+            ticks.append(chunk)
+        return ticks
+
+    def bars(self, timeframe=None, ticks=None, volume=None):
+        """Return bars built from the ticks (see `BarBuilder`)."""
+        builder = BarBuilder(timeframe=timeframe, ticks=ticks, volume=volume)
+        for chunk in self.chunks():
+            builder.update(chunk)
+        return builder.finish()
+
+    def save(self, fpath):
+        data = {name: self[name] for name in self.columns}
+        save_quotes(fpath, data, meta={'ticks': True}, columns=self.columns)
+
+    @classmethod
+    def load(cls, fpath):
+        """Return ticks from the file (columns are memory-mapped)."""
+        meta, columns = load_quotes(fpath, mmap=True)
+        ticks = cls(with_quotes='bid' in columns, capacity=0)
+        ticks._data = columns
+        ticks._size = len(columns['time'])
+        return ticks
+
+
+class BarBuilder:
+    """Build bars from a stream of ticks.
+
+    A new bar is started by one of the rules:
+        * `timeframe` - on the timeframe boundary;
+        * `ticks` - after every N ticks;
+        * `volume` - when the total size of the bar's ticks reaches N.
+    Ticks are passed by chunks, so only the current chunk and
+    the unfinished bar are kept in memory (besides the built bars).
+    """
+
+    def __init__(self, timeframe=None, ticks=None, volume=None):
+        if sum(arg is not None for arg in (timeframe, ticks, volume)) != 1:
+            raise ValueError(
+                'Exactly one of timeframe/ticks/volume is required'
+            )
+        self.timeframe = timeframe
+        self.ticks = ticks
+        self.volume = volume
+        self._bars = QuotesBuffer(timeframe=timeframe)
+        # unfinished bar: (key, time, open, high, low, close, volume)
+        self._last = None
+        self._tick_count = 0
+        self._total_volume = 0
+
+    def _keys(self, chunk):
+        """Return a number of the bar for each tick."""
+        if self.timeframe is not None:
+            return bucket_keys(chunk['time'], self.timeframe)
+        if self.ticks is not None:
+            count = len(chunk['time'])
+            keys = np.arange(self._tick_count, self._tick_count + count)
+            self._tick_count += count
+            return keys // self.ticks
+        # by the volume of ticks before the current one,
+        # so a tick is never split between the bars
+        volume_before = np.cumsum(chunk['size']) - chunk['size']
+        keys = (self._total_volume + volume_before) // self.volume
+        self._total_volume += int(np.sum(chunk['size']))
+        return keys
+
+    def update(self, chunk):
+        """Add ticks (a dict of columns) and build the finished bars."""
+        if not len(chunk['time']):
+            return
+        keys = self._keys(chunk)
+        starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+        ends = np.append(starts[1:], len(keys)) - 1
+        price, size = chunk['price'], chunk['size']
+        if self.timeframe is not None:
+            times = bucket_times(keys[starts], self.timeframe)
+        else:
+            times = chunk['time'][starts]
+        bars = {
+            'key': keys[starts],
+            'time': times,
+            'open': price[starts],
+            'high': np.maximum.reduceat(price, starts),
+            'low': np.minimum.reduceat(price, starts),
+            'close': price[ends],
+            'volume': np.add.reduceat(size, starts),
+        }
+        if self._last is not None:
+            key, time, _open, high, low, close, volume = self._last
+            if bars['key'][0] == key:
+                # the unfinished bar is continued
+                bars['time'][0] = time
+                bars['open'][0] = _open
+                bars['high'][0] = max(high, bars['high'][0])
+                bars['low'][0] = min(low, bars['low'][0])
+                bars['volume'][0] += volume
+            else:
+                self._append_last()
+        # the last bar may be continued in the next chunk
+        self._last = tuple(column[-1] for column in bars.values())
+        self._bars.extend({k: v[:-1] for k, v in bars.items()})
+
+    def _append_last(self):
+        key, time, _open, high, low, close, volume = self._last
+        self._bars.append(time, _open, high, low, close, volume)
+        self._last = None
+
+    def finish(self):
+        """Return all the built bars (including the unfinished one)."""
+        if self._last is not None:
+            self._append_last()
+        return self._bars.quotes
@@ -0,0 +1,145 @@
+"""Resampling of quotes to the other timeframes."""
+
+import numpy as np
+
+from .base import BaseQuotes
+from .const import TIMEFRAME_SECONDS, TimeFrame
+
+__all__ = ('ResampleCache', 'resample')
+
+
+# 01.01.1970 is Thursday, weeks start on Monday
+WEEK_OFFSET = 3 * TIMEFRAME_SECONDS[TimeFrame.D1]
+
+
+def _check_timeframe(timeframe):
+    if timeframe not in TIMEFRAME_SECONDS:
+        raise ValueError(
+            'Wrong timeframe: %r (the timeframe of quotes with less than '
+            '2 bars or made by hand should be set)' % (timeframe,)
+        )
+
+
+def bucket_keys(time, timeframe):
+    """Return a number of the timeframe bar for each timestamp."""
+    _check_timeframe(timeframe)
+    if timeframe == TimeFrame.MN:
+        months = time.astype('i8').astype('datetime64[s]')
+        return months.astype('datetime64[M]').astype('i8')
+    if timeframe == TimeFrame.W1:
+        time = time + WEEK_OFFSET
+    return np.floor_divide(time, TIMEFRAME_SECONDS[timeframe]).astype('i8')
+
+
+def bucket_times(keys, timeframe):
+    """Return an open time of the timeframe bar with the number."""
+    _check_timeframe(timeframe)
+    if timeframe == TimeFrame.MN:
+        months = keys.astype('datetime64[M]').astype('datetime64[s]')
+        return months.astype('i8').astype(float)
+    time = keys * float(TIMEFRAME_SECONDS[timeframe])
+    if timeframe == TimeFrame.W1:
+        time -= WEEK_OFFSET
+    return time
+
+
+def completed_bars(quotes, higher):
+    """Return the last bar of `higher` completed by each bar of `quotes`.
+
+    `higher` are quotes of a higher timeframe, its bar is completed
+    when a bar of `quotes` ends not earlier than it. The result is
+    an array of the indexes (-1 if there is no completed bar yet).
+    """
+    _check_timeframe(quotes.timeframe)
+    _check_timeframe(higher.timeframe)
+    ends = bucket_times(
+        bucket_keys(higher.time, higher.timeframe) + 1, higher.timeframe
+    )
+    closes = bucket_times(
+        bucket_keys(quotes.time, quotes.timeframe) + 1, quotes.timeframe
+    )
+    return np.searchsorted(ends, closes, side='right') - 1
+
+
+def bucket_starts(quotes, timeframe):
+    """Return indexes of the first bars of each timeframe bar."""
+    keys = bucket_keys(quotes.time, timeframe)
+    if not len(keys):
+        return keys, keys
+    starts = np.flatnonzero(np.diff(keys)) + 1
+    starts = np.concatenate(([0], starts))
+    return starts, keys[starts]
+
+
+def resample(quotes, timeframe):
+    """Return the quotes aggregated to the (higher) timeframe.
+
+    Bars are grouped by the timeframe boundaries: open - first,
+    high - max, low - min, close - last, volume - sum.
+    """
+    starts, keys = bucket_starts(quotes, timeframe)
+    result = BaseQuotes(shape=(len(starts),))
+    result.timeframe = timeframe
+    if not len(starts):
+        return result
+    ends = np.append(starts[1:], len(quotes)) - 1
+    result.id = np.arange(len(starts))
+    result.time = bucket_times(keys, timeframe)
+    result.open = quotes.open[starts]
+    result.high = np.maximum.reduceat(quotes.high, starts)
+    result.low = np.minimum.reduceat(quotes.low, starts)
+    result.close = quotes.close[ends]
+    result.volume = np.add.reduceat(quotes.volume, starts)
+    return result
+
+
+class ResampleCache:
+    """Cache of the resampled quotes by (symbol, timeframe).
+
+    If the base quotes have been extended since the last call,
+    only the last (possibly unfinished) bar and the new bars are
+    recalculated.
+    """
+
+    def __init__(self):
+        self._data = {}
+
+    def clear(self, symbol=None):
+        if symbol is None:
+            self._data.clear()
+            return
+        for key in [k for k in self._data if k[0] == symbol]:
+            del self._data[key]
+
+    def get(self, symbol, quotes, timeframe):
+        if timeframe == quotes.timeframe:
+            return quotes
+        key = (symbol, timeframe)
+        cached = self._data.get(key)
+        if cached is not None and self._is_extended(quotes, cached):
+            resampled, base_len, base_time, last_start = cached
+            if base_len == len(quotes):
+                return resampled
+            base_tail = quotes[last_start:]
+            tail = resample(base_tail, timeframe)
+            result = np.concatenate((resampled[:-1], tail)).view(BaseQuotes)
+            result.id = np.arange(len(result))
+            result.timeframe = timeframe
+            last_start += bucket_starts(base_tail, timeframe)[0][-1]
+        elif len(quotes):
+            result = resample(quotes, timeframe)
+            last_start = bucket_starts(quotes, timeframe)[0][-1]
+        else:
+            return resample(quotes, timeframe)
+        base_time = (quotes.time[0], quotes.time[-1])
+        self._data[key] = (result, len(quotes), base_time, last_start)
+        return result
+
+    def _is_extended(self, quotes, cached):
+        """Whether the quotes are the cached ones with new bars."""
+        resampled, base_len, (first_time, last_time), last_start = cached
+        return (
+            len(quotes) >= base_len
+            and quotes.time[0] == first_time
+            and quotes.time[base_len - 1] == last_time
+        )
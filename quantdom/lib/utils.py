@@ -6,7 +6,9 @@ import logging
 import os
 import os.path
 import sys
+import threading
 import time
+from contextlib import contextmanager
 from datetime import datetime
 from functools import wraps
 
@@ -14,6 +16,7 @@ from PyQt5 import QtCore
 
 __all__ = (
     'BASE_DIR',
+    'ActiveProxy',
     'Settings',
     'timeit',
     'fromtimestamp',
@@ -67,6 +70,59 @@ def fromtimestamp(timestamp):
     return datetime.fromtimestamp(timestamp)
 
 
+class ActiveProxy:
+    """Proxy to the object that is active in the current thread.
+
+    Attributes (and `len`/`bool`) are taken from the object set by
+    `activate`, or from the default object if none is active. It allows
+    the global objects (e.g. `Portfolio`) to be replaced for a part of
+    the code without changing it.
+    """
+
+    __slots__ = ('_default', '_local')
+
+    def __init__(self, default):
+        object.__setattr__(self, '_default', default)
+        object.__setattr__(self, '_local', threading.local())
+
+    @property
+    def default(self):
+        return self._default
+
+    def current(self):
+        obj = getattr(self._local, 'obj', None)
+        return self._default if obj is None else obj
+
+    def set_current(self, obj):
+        """Make the object (None - the default) active, return the previous."""
+        previous = getattr(self._local, 'obj', None)
+        self._local.obj = obj
+        return previous
+
+    @contextmanager
+    def activate(self, obj):
+        previous = self.set_current(obj)
+        try:
+            yield obj
+        finally:
+            self.set_current(previous)
+
+    def __getattr__(self, name):
+        return getattr(self.current(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self.current(), name, value)
+
+    def __len__(self):
+        return len(self.current())
+
+    def __bool__(self):
+        return bool(self.current())
+
+    def __repr__(self):
+        return '<%s of %r>' % (self.__class__.__name__, self.current())
+
+
 def strategies_from_file(filepath):
     from .strategy import AbstractStrategy
 
@@ -78,5 +134,11 @@ def strategies_from_file(filepath):
         inspect.isclass(_class)
         and issubclass(_class, AbstractStrategy)
         and _class.__name__ != 'AbstractStrategy'
+        # base classes (e.g. VectorizedStrategy)
+        and not inspect.isabstract(_class)
     )
-    return [_class for _, _class in inspect.getmembers(module, is_strategy)]
+    classes = [_class for _, _class in inspect.getmembers(module, is_strategy)]
+    for _class in classes:
+        # the module isn't importable, so keep the way to load them again
+        _class.filepath = filepath
+    return classes
@@ -4,18 +4,25 @@ import logging
 import logging.config
 import os.path
 from datetime import datetime
+from functools import partial
 
 from PyQt5 import QtCore, QtGui
 
 from .lib import (
+    BayesianSearch,
     EquityChart,
+    GeneticSearch,
     OptimizatimizedResultsTable,
     OptimizationTable,
     Portfolio,
+    Quotes,
     QuotesChart,
+    RandomSearch,
     ResultsTable,
     Settings,
+    SuccessiveHalving,
     Symbol,
+    TimeFrame,
     TradesTable,
     get_quotes,
     get_symbols,
@@ -29,6 +36,14 @@ logger = logging.getLogger(__name__)
 
 DEFAULT_TICKER = 'AAPL'
 SYMBOL_COLUMNS = ['Symbol', 'Security Name']
+# methods of optimization: (name, function of the budget -> search)
+SEARCHES = (
+    ('All variants', lambda budget: None),
+    ('Random', lambda budget: RandomSearch(budget)),
+    ('Bayesian', lambda budget: BayesianSearch(budget)),
+    ('Genetic', lambda budget: GeneticSearch(budget)),
+    ('Successive halving', lambda budget: SuccessiveHalving()),
+)
 
 
 class SymbolsLoaderThread(QtCore.QThread):
@@ -179,11 +194,14 @@ class DataTabWidget(QtGui.QWidget):
         self.date_from = self.shares_date_from.date().toPyDate()
         self.date_to = self.shares_date_to.date().toPyDate()
 
-        get_quotes(
+        quotes = get_quotes(
             symbol=self.symbol.ticker,
             date_from=self.date_from,
             date_to=self.date_to,
         )
+        if len(quotes):
+            # for the code that still uses the global quotes
+            Quotes.new(quotes)
 
         self.data_updated.emit(self.symbol)
 
@@ -270,28 +288,66 @@ class QuotesTabWidget(QtGui.QWidget):
         self.tf_layout = QtGui.QHBoxLayout()
         self.tf_layout.setSpacing(0)
         self.tf_layout.setContentsMargins(0, 12, 0, 0)
-        time_frames = ('1M', '5M', '15M', '30M', '1H', '1D', '1W', 'MN')
+        time_frames = (
+            ('1M', TimeFrame.M1),
+            ('5M', TimeFrame.M5),
+            ('15M', TimeFrame.M15),
+            ('30M', TimeFrame.M30),
+            ('1H', TimeFrame.H1),
+            ('4H', TimeFrame.H4),
+            ('1D', TimeFrame.D1),
+            ('1W', TimeFrame.W1),
+            ('MN', TimeFrame.MN),
+        )
         btn_prefix = 'TF'
-        for tf in time_frames:
-            btn_name = ''.join([btn_prefix, tf])
-            btn = QtGui.QPushButton(tf)
-            # TODO:
+        self.tf_buttons = {}
+        self.tf_group = QtGui.QButtonGroup(self)
+        for name, tf in time_frames:
+            btn_name = ''.join([btn_prefix, name])
+            btn = QtGui.QPushButton(name)
+            btn.setCheckable(True)
             btn.setEnabled(False)
+            btn.clicked.connect(partial(self.set_timeframe, tf))
+            self.tf_group.addButton(btn)
+            self.tf_buttons[tf] = btn
             setattr(self, btn_name, btn)
             self.tf_layout.addWidget(btn)
         self.toolbar_layout.addLayout(self.tf_layout)
 
+    def _update_timeframes_ui(self):
+        """Enable only the timeframes that are higher than the base one."""
+        base_tf = Portfolio.store.get(self.symbol).timeframe
+        current_tf = Portfolio.timeframe or base_tf
+        for tf, btn in self.tf_buttons.items():
+            btn.setEnabled(base_tf is not None and tf.value >= base_tf.value)
+            btn.setChecked(tf == current_tf)
+
     def init_strategy_ui(self):
         self.strategy_box = StrategyBoxWidget(self)
         self.toolbar_layout.addWidget(self.strategy_box)
 
-    def update_chart(self, symbol):
+    def _plot_chart(self):
         if not self.chart_layout.isEmpty():
             self.chart_layout.removeWidget(self.chart)
+            self.chart.close()
         self.chart = QuotesChart()
-        self.chart.plot(symbol)
+        self.chart.plot(self.symbol)
         self.chart_layout.addWidget(self.chart)
 
+    def update_chart(self, symbol):
+        self.symbol = symbol
+        Portfolio.timeframe = None  # the timeframe of the loaded quotes
+        self._update_timeframes_ui()
+        self._plot_chart()
+
+    def set_timeframe(self, timeframe, *args):
+        if timeframe == Portfolio.get_quotes(self.symbol).timeframe:
+            return
+        Portfolio.timeframe = timeframe
+        # for the code that still uses the global quotes
+        Quotes.new(Portfolio.get_quotes(self.symbol))
+        self._plot_chart()
+
     def add_signals(self):
         self.chart.add_signals()
 
@@ -341,6 +397,8 @@ class TradesTabWidget(QtGui.QWidget):
 class OptimizationTabWidget(QtGui.QWidget):
 
     optimization_done = QtCore.pyqtSignal()
+    # searches which backtest only `budget` variants
+    budget_searches = ('Random', 'Bayesian', 'Genetic')
 
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -350,11 +408,20 @@ class OptimizationTabWidget(QtGui.QWidget):
         self.top_layout = QtGui.QHBoxLayout()
         self.top_layout.setContentsMargins(0, 10, 0, 0)
 
+        self.search_list = QtGui.QComboBox()
+        self.search_list.addItems([name for name, _ in SEARCHES])
+        self.search_list.currentIndexChanged.connect(self._on_search_changed)
+        self.budget = QtGui.QSpinBox()
+        self.budget.setRange(1, 1_000_000)
+        self.budget.setValue(200)
+        self.budget.setPrefix('Budget: ')
+        self.budget.setEnabled(False)
         self.start_optimization_btn = QtGui.QPushButton('Start')
         self.start_optimization_btn.clicked.connect(self.start_optimization)
-        self.top_layout.addWidget(
-            self.start_optimization_btn, alignment=QtCore.Qt.AlignRight
-        )
+        self.top_layout.addStretch()
+        self.top_layout.addWidget(self.search_list)
+        self.top_layout.addWidget(self.budget)
+        self.top_layout.addWidget(self.start_optimization_btn)
 
         self.layout.addLayout(self.top_layout)
         self.layout.addLayout(self.table_layout)
@@ -368,9 +435,13 @@ class OptimizationTabWidget(QtGui.QWidget):
         self.table.plot(strategy)
         self.table_layout.addWidget(self.table)
 
+    def _on_search_changed(self, index):
+        self.budget.setEnabled(SEARCHES[index][0] in self.budget_searches)
+
     def start_optimization(self, *args, **kwargs):
         logger.debug('Start optimization')
-        self.table.optimize()
+        _, make_search = SEARCHES[self.search_list.currentIndex()]
+        self.table.optimize(search=make_search(self.budget.value()))
         self.optimization_done.emit()
         logger.debug('Optimization is done')
 
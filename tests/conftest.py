@@ -0,0 +1,61 @@
+import os.path
+
+import numpy as np
+import pytest
+
+from quantdom.lib.base import BaseQuotes, Symbol
+from quantdom.lib.portfolio import Portfolio
+from quantdom.lib.store import QuotesStore
+from quantdom.lib.utils import strategies_from_file
+
+EXAMPLES = os.path.join(
+    os.path.dirname(__file__), os.pardir, 'examples', 'simple_strategies.py'
+)
+
+
+def make_quotes(length=300, bars=None, seed=0):
+    """Return daily quotes: a random walk or the given (o, h, l, c) bars."""
+    if bars is None:
+        rng = np.random.RandomState(seed)
+        close = 100 + np.cumsum(rng.standard_normal(length))
+        open = close + rng.standard_normal(length) * 0.5
+        bars = np.column_stack(
+            (
+                open,
+                np.maximum(open, close) + 1,
+                np.minimum(open, close) - 1,
+                close,
+            )
+        )
+    bars = np.asarray(bars, dtype=float)
+    quotes = BaseQuotes(shape=(len(bars),))
+    quotes.id = np.arange(len(bars))
+    quotes.time = np.arange(len(bars)) * 86400.0
+    quotes.open, quotes.high, quotes.low, quotes.close = bars.T
+    quotes.volume = 1000
+    return quotes
+
+
+@pytest.fixture
+def make_symbol():
+    """Return a function adding a symbol with `make_quotes` to the store."""
+    symbols = []
+
+    def make(name='TEST', **kwargs):
+        symbol = Symbol(name, Symbol.SHARES)
+        QuotesStore.add(symbol, make_quotes(**kwargs))
+        symbols.append(symbol)
+        return symbol
+
+    yield make
+    for symbol in symbols:
+        QuotesStore.remove(symbol)
+    Portfolio.clear()
+
+
+@pytest.fixture(scope='session')
+def examples():
+    """Return {name: class} of the example strategies."""
+    return {
+        _class.__name__: _class for _class in strategies_from_file(EXAMPLES)
+    }
@@ -0,0 +1,108 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantdom.lib.base import BaseQuotes, QuotesBuffer
+from quantdom.lib.const import TimeFrame
+
+
+def bars(start, count):
+    """Return hourly bars (time, open, high, low, close, volume)."""
+    return [
+        (i * 3600.0, i + 1.0, i + 2.0, i + 0.5, i + 1.5, i)
+        for i in range(start, start + count)
+    ]
+
+
+def columns(rows):
+    names = ('time', 'open', 'high', 'low', 'close', 'volume')
+    return dict(zip(names, map(np.array, zip(*rows))))
+
+
+def test_quotes_buffer():
+    buffer = QuotesBuffer(capacity=2, timeframe=TimeFrame.H1)
+    assert len(buffer) == 0
+    rows = bars(0, 5)
+    for row in rows[:2]:
+        buffer.append(*row)
+    view = buffer.quotes
+    assert buffer.capacity == 2
+    # appending past the capacity grows the buffer
+    buffer.append(*rows[2])
+    assert buffer.capacity == 4
+    buffer.extend(columns(rows[3:]))
+    assert buffer.capacity == 8
+    assert len(buffer) == 5
+
+    quotes = buffer.quotes
+    expected = BaseQuotes().new(columns(rows))
+    for name in quotes.dtype.names:
+        np.testing.assert_array_equal(quotes[name], expected[name])
+    assert quotes.timeframe == expected.timeframe == TimeFrame.H1
+    # a view taken before the growth keeps the old bars
+    assert len(view) == 2
+    assert view.close.tolist() == quotes.close[:2].tolist()
+    assert np.shares_memory(buffer.quotes, quotes)
+
+
+def test_quotes_buffer_from_quotes():
+    quotes = BaseQuotes().new(columns(bars(0, 3)))
+    quotes.timeframe = TimeFrame.H4
+    buffer = QuotesBuffer(quotes, capacity=1)
+    assert buffer.timeframe == TimeFrame.H4
+    buffer.extend(BaseQuotes().new(columns(bars(3, 4))))
+    result = buffer.quotes
+    assert result.timeframe == TimeFrame.H4
+    assert result[2:].timeframe == TimeFrame.H4
+    assert result.id.tolist() == list(range(7))
+    assert result.time.tolist() == [i * 3600.0 for i in range(7)]
+    # the original quotes aren't changed
+    assert len(quotes) == 3
+    assert not np.shares_memory(result, quotes)
+
+
+def test_bar_index():
+    quotes = BaseQuotes().new(columns(bars(0, 5)))
+    assert quotes.bar_index(0.0) == 0
+    assert quotes.bar_index(3 * 3600.0) == 3
+    assert quotes.bar_index(4 * 3600.0) == 4
+    # the right index is taken as is, a wrong one is ignored
+    assert quotes.bar_index(2 * 3600.0, id_bar=2) == 2
+    assert quotes.bar_index(2 * 3600.0, id_bar=4) == 2
+    assert quotes.bar_index(2 * 3600.0, id_bar=10) == 2
+    assert quotes.bar_index(2 * 3600.0, id_bar=-1) == 2
+    # a slice: ids of the bars differ from their indexes
+    assert quotes[2:].bar_index(3 * 3600.0, id_bar=3) == 1
+    for time in (1800.0, -3600.0, 5 * 3600.0):
+        with pytest.raises(ValueError):
+            quotes.bar_index(time)
+    with pytest.raises(ValueError):
+        quotes.bar_index(1800.0, id_bar=0)
+
+
+def old_convert_dates(dates):
+    """Conversion of the dates row by row (before vectorizing)."""
+    return np.array([d.timestamp() for d in dates])
+
+
+@pytest.mark.parametrize('tz', [None, 'UTC', 'US/Eastern', 'Asia/Tokyo'])
+def test_convert_dates(tz):
+    # across the DST changes and with fractions of seconds
+    dates = pd.date_range(
+        '2018-03-01', '2018-11-30', freq='7h13min2500ms', tz=tz, name='Date'
+    )
+    expected = old_convert_dates(dates)
+    for values in (dates, pd.Series(dates), list(dates)):
+        result = BaseQuotes.convert_dates(values)
+        assert result.dtype == np.float64
+        np.testing.assert_allclose(result, expected, rtol=0, atol=1e-6)
+
+    data = pd.DataFrame(
+        {name: 1.0 for name in ('Open', 'High', 'Low', 'Close', 'Volume')},
+        index=dates,
+    )
+    quotes = BaseQuotes().new(data, default_tf=60)
+    np.testing.assert_allclose(quotes.time, expected, rtol=0, atol=1e-6)
+    # dates in the column instead of the index
+    quotes = BaseQuotes().new(data.reset_index(), default_tf=60)
+    np.testing.assert_allclose(quotes.time, expected, rtol=0, atol=1e-6)
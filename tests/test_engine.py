@@ -0,0 +1,112 @@
+import numpy as np
+import pytest
+
+from quantdom.lib.base import BaseQuotes
+from quantdom.lib.const import TimeFrame
+from quantdom.lib.engine import HigherTimeframe, iter_bar_slices, iter_bars
+from quantdom.lib.portfolio import Portfolio
+from quantdom.lib.storage import MappedQuotes, save_quotes
+from quantdom.lib.store import QuotesStore
+from quantdom.lib.timeframes import resample
+
+
+def quotes_at(times):
+    """Return quotes with bars at the times (prices are times * 10)."""
+    quotes = BaseQuotes(shape=(len(times),))
+    quotes.id = np.arange(len(times))
+    quotes.time = times
+    for name in ('open', 'high', 'low', 'close'):
+        quotes[name] = np.multiply(times, 10)
+    quotes.volume = 1
+    return quotes
+
+
+def test_iter_bar_slices():
+    quotes = {'A': quotes_at([1, 2, 4, 5]), 'B': quotes_at([2, 3, 5])}
+    result = []
+    for bars in iter_bar_slices(quotes):
+        row = [bars.time]
+        for ticker in ('A', 'B'):
+            bar = bars[ticker]
+            row.append(None if bar is None else (bar.close, bar.missing))
+        result.append(row)
+    assert result == [
+        [1, (10, False), None],
+        [2, (20, False), (20, False)],
+        # missing bars are forward-filled
+        [3, (20, True), (30, False)],
+        [4, (40, False), (30, True)],
+        [5, (50, False), (50, False)],
+    ]
+    # a copy keeps the values of the bar of the last slice
+    bar = bars['A'].copy()
+    assert type(bar) is type(bars['A'])
+    assert (bar.time, bar.close, bar.missing) == (5, 50, False)
+
+
+@pytest.mark.parametrize('chunksize', [1, 2, 3, 10])
+def test_iter_bar_slices_by_chunks(tmp_path, chunksize):
+    save_quotes(str(tmp_path / 'a.qdom'), quotes_at([1, 2, 4, 5, 8, 9]))
+    quotes = {
+        'A': MappedQuotes(str(tmp_path / 'a.qdom')),
+        'B': quotes_at([2, 3, 5, 6, 7]),
+        'C': quotes_at([9]),
+    }
+
+    def slices(chunksize):
+        return [
+            [bars.time]
+            + [None if bar is None else bar.copy() for _, bar in bars]
+            for bars in iter_bar_slices(quotes, chunksize)
+        ]
+
+    expected = slices(None)
+    assert len(expected) == 9
+    result = slices(chunksize)
+    assert [row[0] for row in result] == [row[0] for row in expected]
+    for row, expected_row in zip(result, expected):
+        for bar, expected_bar in zip(row[1:], expected_row[1:]):
+            assert repr(bar) == repr(expected_bar)
+            if bar is not None:
+                assert bar.missing == expected_bar.missing
+
+
+def test_chunked_backtest(tmp_path, make_symbol, examples):
+    symbol = make_symbol(length=1000)
+    strategy = examples['ThreeBarStrategy'](symbols=[symbol])
+
+    def positions():
+        Portfolio.clear()
+        strategy.run()
+        return [
+            (p.type, p.id_bar_open, p.id_bar_close, p.open_price, p.profit)
+            for p in Portfolio.positions
+        ]
+
+    expected = positions()
+    assert expected
+    fpath = str(tmp_path / 'quotes.qdom')
+    save_quotes(fpath, QuotesStore.get(symbol))
+    QuotesStore.add(symbol, MappedQuotes(fpath))
+    strategy.chunksize = 64
+    assert positions() == expected
+
+
+def test_higher_timeframe():
+    # hourly bars of 10:00-15:00 for 3 days
+    times = [
+        day * 86400 + hour * 3600 for day in range(3) for hour in range(10, 16)
+    ]
+    quotes = quotes_at(times)
+    quotes.timeframe = TimeFrame.H1
+    daily = resample(quotes, TimeFrame.D1)
+    htf = HigherTimeframe(quotes, daily)
+    bars = [bar.copy() for bar in iter_bars(quotes)]
+    # a day is completed only after its end (the next day's first bar)
+    assert htf.last(bars[0]) is None
+    assert htf.last(bars[5]) is None
+    assert htf.last(bars[6]).time == daily.time[0]
+    assert htf.last(bars[6]).close == quotes.close[5]
+    assert htf.last(bars[6], ago=1) is None
+    assert htf.last(bars[17]).time == daily.time[1]
+    assert htf.index.tolist() == [-1] * 6 + [0] * 6 + [1] * 6
@@ -0,0 +1,145 @@
+import gc
+import inspect
+
+import numpy as np
+import pytest
+
+from quantdom.lib import indicators
+from quantdom.lib.base import BaseQuotes
+from quantdom.lib.indicators import (
+    ATR,
+    EMA,
+    MACD,
+    RSI,
+    SMA,
+    BaseIndicatorCache,
+    BollingerBands,
+    RollingMax,
+    RollingMin,
+    RollingStd,
+)
+
+
+@pytest.fixture
+def columns():
+    rng = np.random.RandomState(0)
+    close = 100 + np.cumsum(rng.standard_normal(500))
+    spread = rng.uniform(0.1, 2, 500)
+    # a few flat bars to check the edge cases (e.g. zero changes)
+    close[100:110] = close[100]
+    return {'high': close + spread, 'low': close - spread, 'close': close}
+
+
+INDICATORS = [
+    SMA(20),
+    EMA(20),
+    RollingStd(20),
+    RollingMax(20),
+    RollingMin(20),
+    ATR(14),
+    RSI(14),
+    BollingerBands(20, k=2),
+    MACD(12, 26, 9),
+]
+
+
+def test_all_indicators_are_tested():
+    exported = {
+        obj
+        for obj in map(indicators.__dict__.get, indicators.__all__)
+        if inspect.isclass(obj) and issubclass(obj, indicators.BaseIndicator)
+    }
+    assert exported == {type(indicator) for indicator in INDICATORS}
+    with pytest.raises(TypeError):
+        # `update` and `calculate` are required
+        type('Incomplete', (indicators.BaseIndicator,), {})(10)
+
+
+@pytest.mark.parametrize(
+    'indicator', INDICATORS, ids=lambda indicator: indicator.label
+)
+def test_streaming_equals_vectorized(indicator, columns):
+    inputs = [columns[name] for name in indicator.inputs]
+    vectorized = indicator.calculate(*inputs)
+    streaming = np.array(
+        [indicator.update(*values) for values in zip(*inputs)]
+    )
+    if indicator.lines is not None:
+        vectorized = np.column_stack(vectorized)
+    assert np.isnan(vectorized[-1]).sum() == 0
+    np.testing.assert_array_equal(streaming, vectorized)
+
+
+@pytest.fixture
+def quotes(columns):
+    quotes = BaseQuotes(shape=(len(columns['close']),))
+    quotes.time = np.arange(len(quotes)) * 60.0
+    for name, values in columns.items():
+        quotes[name] = values
+    return quotes
+
+
+def test_indicator_cache(quotes):
+    cache = BaseIndicatorCache()
+    values = cache.get(quotes, SMA, 20)
+    np.testing.assert_array_equal(values, SMA(20).calculate(quotes.close))
+    assert cache.get(quotes, SMA, 20) is values
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert not values.flags.writeable
+    # other parameters, other values
+    assert cache.get(quotes, SMA, 10) is not values
+    # functions are cached with their results (also several arrays)
+    bands = cache.get(quotes, lambda q, k: (q.high * k, q.low * k), 2)
+    assert cache.nbytes == values.nbytes * 4
+    assert all(not band.flags.writeable for band in bands)
+
+
+def test_indicator_cache_eviction(quotes):
+    size = len(quotes) * 8
+    cache = BaseIndicatorCache(max_bytes=size * 2)
+    sma10 = cache.get(quotes, SMA, 10)
+    cache.get(quotes, SMA, 20)
+    # SMA(10) is used recently, so SMA(20) is the one to evict
+    assert cache.get(quotes, SMA, 10) is sma10
+    cache.get(quotes, SMA, 30)
+    assert len(cache) == 2
+    assert cache.nbytes == size * 2
+    assert cache.get(quotes, SMA, 10) is sma10
+    misses = cache.misses
+    cache.get(quotes, SMA, 20)
+    assert cache.misses == misses + 1
+    # values bigger than the budget aren't cached
+    cache.get(quotes, BollingerBands, 20)
+    assert len(cache) == 2
+    assert cache.nbytes <= cache.max_bytes
+
+
+def test_indicator_cache_invalidation(quotes):
+    cache = BaseIndicatorCache()
+    values = cache.get(quotes, SMA, 20)
+    # the quotes are changed in place (e.g. the last bar is updated)
+    quotes.close[-1] += 10
+    updated = cache.get(quotes, SMA, 20)
+    assert updated is not values
+    assert updated[-1] == pytest.approx(values[-1] + 0.5)
+    assert cache.misses == 2
+    assert len(cache) == 1
+    assert cache.nbytes == values.nbytes
+
+
+def test_indicator_cache_cleanup(quotes):
+    cache = BaseIndicatorCache()
+    # the fixture is referenced by pytest, so a copy is removed
+    removed = quotes.copy()
+    cache.get(removed, SMA, 20)
+    cache.get(removed, EMA, 20)
+    cache.get(quotes, SMA, 20)
+    assert len(cache) == 3
+    # the values are removed with their quotes
+    del removed
+    gc.collect()
+    assert len(cache) == 1
+    assert cache.nbytes == len(quotes) * 8
+    assert len(cache._finalizers) == 1
+    cache.clear()
+    assert (len(cache), cache.nbytes, cache._finalizers) == (0, 0, {})
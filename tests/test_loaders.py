@@ -0,0 +1,145 @@
+import io
+import threading
+from collections import Counter
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import numpy as np
+import pandas as pd
+import pytest
+import requests
+from pandas_datareader._utils import RemoteDataError
+
+from quantdom.lib.loaders import QuotesLoader, get_quotes, get_quotes_batch
+from quantdom.lib.storage import QuotesCache
+from quantdom.lib.store import BaseQuotesStore
+
+
+def make_csv(symbol):
+    index = pd.date_range('2018-01-01', '2018-03-31', freq='B', name='Date')
+    price = np.linspace(10, 20, len(index)) + len(symbol)
+    data = pd.DataFrame(
+        {
+            'Open': price,
+            'High': price + 1,
+            'Low': price - 1,
+            'Close': price + 0.5,
+            'Volume': 1000,
+        },
+        index=index,
+    )
+    return data.to_csv()
+
+
+class QuotesHandler(BaseHTTPRequestHandler):
+    def do_GET(self):  # noqa
+        symbol = self.path.strip('/')
+        self.server.requests[symbol] += 1
+        # every first request of the FAIL symbol fails, DOWN always fails
+        first = self.server.requests[symbol] == 1
+        if symbol == 'DOWN' or symbol == 'FAIL' and first:
+            self.send_response(500)
+            self.end_headers()
+            return
+        body = make_csv(symbol).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/csv')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = HTTPServer(('127.0.0.1', 0), QuotesHandler)
+    httpd.requests = Counter()
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def loader(server, tmp_path):
+    url = 'http://127.0.0.1:%d/%%s' % server.server_address[1]
+
+    class LocalQuotesLoader(QuotesLoader):
+        source = 'local'
+        default_tf = 1440
+        rate_limit = 100
+        retry_delay = 0.01
+
+        @classmethod
+        def _get(cls, symbol, date_from, date_to, session=None):
+            response = (session or requests).get(url % symbol)
+            response.raise_for_status()
+            return pd.read_csv(
+                io.StringIO(response.text), index_col='Date', parse_dates=True
+            )
+
+        @classmethod
+        def _get_cache(cls):
+            return QuotesCache(str(tmp_path))
+
+    return LocalQuotesLoader
+
+
+def test_get_quotes_batch(server, loader):
+    symbols = ['AAPL', 'MSFT', 'FAIL', 'DOWN', 'IBM', 'AAPL']
+    loaded = []
+    store = BaseQuotesStore()
+    quotes = get_quotes_batch(
+        symbols,
+        date(2018, 1, 1),
+        date(2018, 3, 31),
+        loaders=[loader],
+        store=store,
+        max_workers=3,
+        callback=lambda symbol, quotes: loaded.append(symbol),
+    )
+    assert sorted(quotes) == sorted(loaded) == ['AAPL', 'FAIL', 'IBM', 'MSFT']
+    assert server.requests['FAIL'] == 2  # retried
+    # skipped after all retries, the others are loaded
+    assert server.requests['DOWN'] == 3
+    assert 'DOWN' not in store
+    assert server.requests['AAPL'] == 1
+    assert len(quotes['MSFT']) == 65
+    assert quotes['IBM'].close[0] == 13.5
+    assert quotes['IBM'] is not quotes['MSFT']
+    assert store.get('IBM') is quotes['IBM']
+
+    # the second time quotes are served from the cache
+    quotes = get_quotes_batch(
+        ['IBM'],
+        date(2018, 2, 1),
+        date(2018, 2, 28),
+        loaders=[loader],
+        store=store,
+    )
+    assert server.requests['IBM'] == 1
+    assert len(quotes['IBM']) == 20
+
+
+def test_get_quotes(server, loader):
+    store = BaseQuotesStore()
+    quotes = get_quotes(
+        'IBM', date(2018, 1, 1), date(2018, 1, 31), [loader], store
+    )
+    assert len(quotes) == 23
+    assert store.get('IBM') is quotes
+
+    class DownLoader(loader):
+        @classmethod
+        def _get(cls, *args, **kwargs):
+            raise RemoteDataError('Unable to read URL')
+
+    # an empty result (like before) if the quotes can't be loaded
+    quotes = get_quotes(
+        'MSFT', date(2018, 1, 1), date(2018, 1, 31), [DownLoader], store
+    )
+    assert quotes == []
+    assert 'MSFT' not in store
@@ -0,0 +1,217 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from quantdom.lib.context import DefaultContext, RunContext
+from quantdom.lib.optimization import (
+    BayesianSearch,
+    BudgetSearch,
+    GeneticSearch,
+    ParamGrid,
+    RandomSearch,
+    SuccessiveHalving,
+    run_parallel,
+)
+from quantdom.lib.performance import BriefPerformance
+from quantdom.lib.portfolio import Order, Portfolio, Position
+from quantdom.lib.strategy import AbstractStrategy
+
+
+@pytest.fixture
+def symbol(make_symbol):
+    return make_symbol(length=500)
+
+
+class Channel(AbstractStrategy):
+    volume = 1
+
+    def init(self, entry=10, exit=5):
+        self.entry = entry
+        self.exit = exit
+        self.closes = []
+        self.position = None
+
+    def handle(self, bar):
+        self.closes.append(bar.close)
+        if self.position is not None and self.position.status == Position.OPEN:
+            if bar.close <= min(self.closes[-self.exit :]):
+                Order.close(self.position, bar.close, bar.time, id_bar=bar.id)
+        elif bar.close >= max(self.closes[-self.entry :]):
+            self.position = Order.open(
+                self.symbol,
+                Order.BUY,
+                price=bar.close,
+                volume=self.volume,
+                time=bar.time,
+                id_bar=bar.id,
+            )
+
+
+def test_param_grid():
+    params = {'a': [1, 2, 3], 'b': np.arange(4), 'c': ['x', 'y']}
+    grid = ParamGrid(params)
+    expected = [
+        dict(zip(params, values))
+        for values in itertools.product(*params.values())
+    ]
+    assert len(grid) == len(expected) == 24
+    assert list(grid) == expected
+    assert grid[-1] == expected[-1]
+    assert grid[5:9] == expected[5:9]
+    assert list(grid.variants(22)) == expected[22:]
+    assert [list(r) for r in grid.chunks(10, start=3)] == [
+        list(range(3, 13)),
+        list(range(13, 23)),
+        [23],
+    ]
+    assert grid.digits(17) == [2, 0, 1]
+    assert grid.index([2, 0, 1]) == 17
+    with pytest.raises(IndexError):
+        grid[24]
+    # it isn't materialized, so it may be huge
+    assert len(ParamGrid({k: range(100) for k in 'abcdefgh'})) == 100 ** 8
+
+
+@pytest.mark.parametrize('chunksize', [None, 1, 7])
+def test_parallel_optimization(symbol, chunksize):
+    params = {'entry': np.arange(5, 20, 3), 'exit': np.arange(2, 10, 2)}
+    strategy = Channel(symbols=[symbol])
+    Portfolio.run_optimization(strategy, params)
+    serial = Portfolio.brief_performance
+
+    grid = ParamGrid(params)
+    Portfolio.brief_performance = BriefPerformance(shape=(len(grid),))
+    run_parallel(
+        Portfolio.current(), strategy, grid, workers=2, chunksize=chunksize
+    )
+    parallel = Portfolio.brief_performance
+    assert list(parallel.kwargs) == list(grid)
+    for name in serial.dtype.names[1:]:
+        np.testing.assert_array_equal(parallel[name], serial[name])
+    # the year profit is for the whole period of the quotes
+    assert parallel.days == serial.days == 499
+
+    # resumed from the 7th variant
+    Portfolio.run_optimization(strategy, params, workers=2, start=7)
+    resumed = Portfolio.brief_performance
+    assert list(resumed.kwargs) == list(serial.kwargs[7:])
+    np.testing.assert_array_equal(
+        resumed.net_profit_abs, serial.net_profit_abs[7:]
+    )
+
+
+def test_parallel_strategy_copy(symbol, examples):
+    params = {'entry': np.arange(5, 20, 5), 'exit': np.arange(2, 6, 2)}
+    strategy = Channel(name='Channel x3', symbols=[symbol])
+    # the workers get the attributes of the instance, not of its class
+    strategy.volume = 3
+    Portfolio.run_optimization(strategy, params)
+    serial = Portfolio.brief_performance
+    Portfolio.run_optimization(strategy, params, workers=2)
+    np.testing.assert_array_equal(
+        Portfolio.brief_performance.net_profit_abs, serial.net_profit_abs
+    )
+
+    # strategies loaded from a file are loaded from it by the workers
+    strategy = examples['ThreeBarStrategy'](symbols=[symbol])
+    params = {'high_bars': [2, 3], 'low_bars': [2, 3]}
+    Portfolio.run_optimization(strategy, params)
+    serial = Portfolio.brief_performance
+    Portfolio.run_optimization(strategy, params, workers=2)
+    np.testing.assert_array_equal(
+        Portfolio.brief_performance.net_profit_abs, serial.net_profit_abs
+    )
+
+
+def test_optimization_of_other_portfolio(symbol):
+    strategy = Channel(symbols=[symbol], context=RunContext())
+    # the results would be of the positions of another portfolio
+    with pytest.raises(ValueError):
+        Portfolio.run_optimization(strategy, {'entry': [5, 10]})
+    strategy.context.portfolio.run_optimization(strategy, {'entry': [5, 10]})
+    results = strategy.context.portfolio.brief_performance
+    assert (results.total_trades > 0).all()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_top_results(symbol, workers):
+    params = {'entry': np.arange(5, 20, 3), 'exit': np.arange(2, 10, 2)}
+    strategy = Channel(symbols=[symbol])
+    Portfolio.run_optimization(strategy, params)
+    full = Portfolio.brief_performance
+    # the best first, the earlier variant of equal ones first
+    order = sorted(
+        range(len(full)), key=lambda i: (-full.net_profit_abs[i], i)
+    )
+
+    Portfolio.run_optimization(
+        strategy, params, workers=workers, top=5, objective='net_profit_abs'
+    )
+    top = Portfolio.brief_performance
+    assert list(top.kwargs) == list(full.kwargs[order[:5]])
+    for name in full.dtype.names[1:]:
+        np.testing.assert_array_equal(top[name], full[name][order[:5]])
+
+    results = Portfolio.top_results
+    assert results.count == len(full)
+    assert results.best == full.net_profit_abs.max()
+    assert results.quantiles(0.5) == np.median(full.net_profit_abs)
+    for value, (count, total, best) in results.histograms['exit'].items():
+        profits = full.net_profit_abs[[k['exit'] == value for k in full.kwargs]]
+        assert count == len(profits) == 5
+        assert total == pytest.approx(profits.sum())
+        assert best == profits.max()
+
+
+def test_successive_halving(symbol):
+    params = {'entry': np.arange(5, 20, 3), 'exit': np.arange(2, 10, 2)}
+    strategy = Channel(symbols=[symbol])
+    Portfolio.run_optimization(strategy, params)
+    full = Portfolio.brief_performance
+
+    search = SuccessiveHalving(min_fraction=0.25, eta=2)
+    Portfolio.run_optimization(strategy, params, search=search)
+    results = Portfolio.brief_performance
+    assert search.rounds == [(0.25, 20), (0.5, 10), (1, 5)]
+    assert len(results) == 5
+    assert strategy.context is DefaultContext
+    # the survivors are backtested on all quotes like in the full search
+    assert list(results.net_profit_abs) == sorted(
+        results.net_profit_abs, reverse=True
+    )
+    for row in results:
+        i = list(full.kwargs).index(row.kwargs)
+        assert row.net_profit_abs == full.net_profit_abs[i]
+        assert row.year_profit == full.year_profit[i]
+        assert row.total_trades == full.total_trades[i]
+
+
+@pytest.mark.parametrize(
+    'search_class', [RandomSearch, BayesianSearch, GeneticSearch]
+)
+def test_budget_search(symbol, search_class):
+    params = {'entry': np.arange(3, 40), 'exit': np.arange(2, 20)}
+    strategy = Channel(symbols=[symbol])
+    Portfolio.run_optimization(strategy, params, search=search_class(30))
+    results = Portfolio.brief_performance
+    assert len(results) == 30
+    assert len({tuple(k.values()) for k in results.kwargs}) == 30
+    assert list(results.net_profit_abs) == sorted(
+        results.net_profit_abs, reverse=True
+    )
+    # the same seed - the same variants
+    Portfolio.run_optimization(strategy, params, search=search_class(30))
+    assert list(Portfolio.brief_performance.kwargs) == list(results.kwargs)
+
+    # all variants of a small grid
+    params = {'entry': np.arange(5, 20, 3), 'exit': np.arange(2, 10, 2)}
+    Portfolio.run_optimization(strategy, params)
+    full = Portfolio.brief_performance
+    Portfolio.run_optimization(strategy, params, search=search_class(100))
+    results = Portfolio.brief_performance
+    assert sorted(results.net_profit_abs) == sorted(full.net_profit_abs)
+    assert sorted(results.year_profit) == sorted(full.year_profit)
+    # a search has to propose the variants
+    with pytest.raises(TypeError):
+        BudgetSearch(100)
@@ -0,0 +1,86 @@
+import pytest
+
+from quantdom.lib import orders
+from quantdom.lib.engine import iter_bars
+from quantdom.lib.orders import BaseOrderBook
+from quantdom.lib.portfolio import Order, Portfolio, Position
+
+BARS = [
+    # open, high, low, close
+    (100, 101, 99.5, 100.5),
+    (100, 102, 98, 101),
+    (95, 96, 94, 95.5),  # a gap down
+    (96, 110, 95, 109),
+    (109, 112, 104, 105),
+]
+
+
+@pytest.fixture
+def symbol(make_symbol):
+    return make_symbol(bars=BARS)
+
+
+def test_order_book(symbol, monkeypatch):
+    book = BaseOrderBook()
+    # positions opened with SL/TP are protected by the tested book
+    monkeypatch.setattr(orders, 'OrderBook', book)
+    bars = iter_bars(Portfolio.get_quotes(symbol))
+
+    buy = book.place(symbol, Order.BUY_LIMIT, 99, 10, sl=96, tp=120)
+    stop = book.place(symbol, Order.BUY_STOP, 105, 5)
+    # orders out of range of all bars
+    for price in range(200, 1200):
+        book.place(symbol, Order.BUY_STOP, price, 1)
+        book.place(symbol, Order.SELL_STOP, price / 100, 1)
+
+    assert book.process(symbol, next(bars)) == []
+    # the limit order is filled at its price
+    assert book.process(symbol, next(bars)) == [buy]
+    position = buy.position
+    assert position.open_price == 99
+    assert position.id_bar_open == 1
+    assert position.status == Position.OPEN
+    # the price gapped below SL, so it's filled at the open
+    assert len(book.process(symbol, next(bars))) == 1
+    assert position.status == Position.CLOSED
+    assert position.close_price == 95
+    assert position.exit_name == 'SL'
+    # the stop order is filled at its price
+    assert book.process(symbol, next(bars)) == [stop]
+    assert stop.position.open_price == 105
+    assert stop.position.id_bar_open == 3
+    # the position is closed, so its TP isn't triggered
+    assert book.process(symbol, next(bars)) == []
+    assert len(Portfolio.positions) == 2
+
+
+def test_order_book_is_emptied(symbol, monkeypatch):
+    book = BaseOrderBook()
+    monkeypatch.setattr(orders, 'OrderBook', book)
+    bars = iter_bars(Portfolio.get_quotes(symbol))
+    assert not book
+
+    buy = book.place(symbol, Order.BUY_LIMIT, 99, 10, sl=96, tp=120)
+    book.cancel(book.place(symbol, Order.SELL_STOP, 10, 1))
+    assert len(book) == 1
+    book.process(symbol, next(bars))
+    assert book.process(symbol, next(bars)) == [buy]
+    # SL and TP of the position
+    assert len(book) == 2
+    # the position is closed by SL, its TP is removed
+    book.process(symbol, next(bars))
+    assert buy.position.status == Position.CLOSED
+    assert not book
+
+    bar = next(bars)
+    position = Order.open(
+        symbol, Order.BUY, bar.close, 1, bar.time, sl=90, tp=150, id_bar=bar.id
+    )
+    position.sl = 100
+    book.protect(position)
+    assert len(book) == 2
+    Order.close(position, bar.close, bar.time, id_bar=bar.id)
+    assert not book
+
+    book.cancel(book.place(symbol, Order.BUY_STOP, 200, 1))
+    assert not book
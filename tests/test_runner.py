@@ -0,0 +1,169 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from quantdom.lib.context import DefaultContext, RunContext
+from quantdom.lib.engine import iter_bars as engine_iter_bars
+from quantdom.lib.orders import OrderBook
+from quantdom.lib.portfolio import Order, Portfolio, Position
+from quantdom.lib.runner import run_strategies
+from quantdom.lib.strategy import AbstractStrategy
+
+
+@pytest.fixture
+def symbol(make_symbol):
+    return make_symbol(length=300)
+
+
+class Breakout(AbstractStrategy):
+    def init(self, window=10, otype=Order.BUY):
+        self.window = window
+        self.otype = otype
+        self.closes = []
+        self.position = None
+
+    def handle(self, bar):
+        self.closes.append(bar.close)
+        if self.position is not None and self.position.status == Position.OPEN:
+            return
+        if bar.close >= max(self.closes[-self.window :]):
+            # the position is closed by its SL/TP from the order book
+            self.position = Order.open(
+                self.symbol,
+                self.otype,
+                price=bar.close,
+                volume=1,
+                time=bar.time,
+                sl=bar.close - 2,
+                tp=bar.close + 2,
+                id_bar=bar.id,
+            )
+
+
+class FastBreakout(Breakout):
+    def init(self):
+        super().init(window=5)
+
+
+class ShortBreakout(Breakout):
+    def init(self):
+        super().init(otype=Order.SELL)
+
+
+def run_alone(strategy_class, symbol):
+    strategy = strategy_class(symbols=[symbol])
+    Portfolio.clear()
+    strategy.run()
+    Portfolio.summarize()
+    return Portfolio.current()
+
+
+def test_run_strategies(symbol):
+    strategies = [
+        Breakout(symbols=[symbol]),
+        FastBreakout(symbols=[symbol]),
+        ShortBreakout(symbols=[symbol]),
+    ]
+    portfolios, combined = run_strategies(strategies)
+
+    # the same as the backtests of the strategies one by one
+    for strategy, portfolio in zip(strategies, portfolios):
+        expected = run_alone(type(strategy), symbol)
+        assert portfolio is not expected
+        assert len(portfolio.positions) == len(expected.positions) > 0
+        for p, expected_p in zip(portfolio.positions, expected.positions):
+            assert p.close_price == expected_p.close_price
+        assert (
+            portfolio.performance['All'].net_profit_abs
+            == expected.performance['All'].net_profit_abs
+        )
+    assert len(combined.positions) == sum(
+        len(p.positions) for p in portfolios
+    )
+    assert combined.performance['All'].net_profit_abs == pytest.approx(
+        sum(p.performance['All'].net_profit_abs for p in portfolios)
+    )
+    # the default context is active again
+    assert all(s.context is DefaultContext for s in strategies)
+    assert Portfolio.current() is DefaultContext.portfolio
+    assert OrderBook.current() is DefaultContext.orders
+
+
+class ChunkedBreakout(Breakout):
+    chunksize = 7
+
+
+def test_run_strategies_by_chunks(symbol, monkeypatch):
+    chunksizes = []
+
+    def iter_bars(quotes, chunksize=None):
+        chunksizes.append(chunksize)
+        return engine_iter_bars(quotes, chunksize)
+
+    monkeypatch.setattr('quantdom.lib.runner.iter_bars', iter_bars)
+    strategies = [Breakout(symbols=[symbol]), ChunkedBreakout(symbols=[symbol])]
+    portfolios, _ = run_strategies(strategies)
+    assert chunksizes == [7]
+    assert [p.close_price for p in portfolios[1].positions] == [
+        p.close_price for p in portfolios[0].positions
+    ]
+
+
+def mark_to_market(positions, quotes):
+    """Equity curve of the positions calculated bar by bar."""
+    curve = np.zeros(len(quotes))
+    for i, close in enumerate(quotes.close):
+        opened = [p for p in positions if p.id_bar_open <= i < p.id_bar_close]
+        if opened:
+            curve[i] = sum(
+                p.profit for p in positions if p.id_bar_close <= i
+            ) + sum(p.calc_profit(close_price=close) for p in opened)
+    curve[-1] = sum(p.profit for p in positions)
+    return curve
+
+
+def test_combined_equity_curve(symbol):
+    strategies = [Breakout(symbols=[symbol]), ShortBreakout(symbols=[symbol])]
+    portfolios, combined = run_strategies(strategies)
+    # positions of the strategies are open at the same time
+    longs, shorts = (p.positions for p in portfolios)
+    assert any(
+        p.id_bar_open < other.id_bar_close
+        and other.id_bar_open < p.id_bar_close
+        for p in longs
+        for other in shorts
+    )
+    for portfolio in portfolios + [combined]:
+        np.testing.assert_allclose(
+            portfolio.equity_curve,
+            mark_to_market(portfolio.positions, portfolio.quotes),
+        )
+    assert combined.long_curve[-1] == pytest.approx(
+        portfolios[0].long_curve[-1]
+    )
+    assert combined.short_curve[-1] == pytest.approx(
+        portfolios[1].short_curve[-1]
+    )
+
+
+def test_run_in_threads(symbol):
+    strategies = [
+        strategy_class(symbols=[symbol], context=RunContext())
+        for strategy_class in (Breakout, FastBreakout, ShortBreakout) * 4
+    ]
+
+    def backtest(strategy):
+        strategy.run()
+        strategy.context.portfolio.summarize()
+
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(backtest, strategies))
+
+    for strategy in strategies[:3]:
+        expected = run_alone(type(strategy), symbol)
+        for other in strategies[strategies.index(strategy) :: 3]:
+            positions = other.context.portfolio.positions
+            assert len(positions) == len(expected.positions)
+            assert other.context.portfolio.balance == expected.balance
+    assert len(DefaultContext.orders) == 0
@@ -0,0 +1,192 @@
+import json
+import pickle
+
+import numpy as np
+import pytest
+
+from quantdom.lib.base import BaseQuotes
+from quantdom.lib.const import TimeFrame
+from quantdom.lib.storage import (
+    ALIGNMENT,
+    COLUMNS,
+    MAGIC,
+    PREFIX,
+    MappedQuotes,
+    QuotesCache,
+    QuotesFileError,
+    is_quotes_file,
+    load_quotes,
+    save_quotes,
+)
+
+DAY = 86400
+
+
+def daily_quotes(start, end):
+    """Return daily quotes within the [start, end) days."""
+    days = np.arange(start, end)
+    quotes = BaseQuotes(shape=(len(days),))
+    quotes.id = np.arange(len(days))
+    quotes.time = days * float(DAY)
+    quotes.open = days + 0.25
+    quotes.high = days + 1.5
+    quotes.low = days - 1.5
+    quotes.close = days + 0.5
+    quotes.volume = days * 10
+    quotes.timeframe = TimeFrame.D1
+    return quotes
+
+
+def test_save_and_load_quotes(tmp_path):
+    fpath = str(tmp_path / 'quotes.qdom')
+    quotes = daily_quotes(0, 1001)
+    save_quotes(fpath, quotes, meta={'source': 'test'})
+    assert is_quotes_file(fpath)
+
+    with open(fpath, 'rb') as f:
+        magic, version, header_len = PREFIX.unpack(f.read(PREFIX.size))
+        header = json.loads(f.read(header_len).decode('utf-8'))
+    assert magic == MAGIC
+    assert header['length'] == len(quotes)
+    assert header['meta'] == {'source': 'test', 'timeframe': 'D1'}
+    assert [name for name, _, _ in header['columns']] == list(COLUMNS)
+
+    meta, columns = load_quotes(fpath)
+    assert meta == header['meta']
+    for name in COLUMNS:
+        column = columns[name]
+        assert isinstance(column, np.memmap)
+        # the columns are aligned to the cache line size in the file
+        assert column.offset % ALIGNMENT == 0
+        assert column.dtype == quotes[name].dtype
+        np.testing.assert_array_equal(column, quotes[name])
+    # read to memory
+    meta, columns = load_quotes(fpath, mmap=False)
+    assert not isinstance(columns['close'], np.memmap)
+    np.testing.assert_array_equal(columns['close'], quotes.close)
+
+    loaded = MappedQuotes(fpath)
+    assert loaded.timeframe == TimeFrame.D1
+    assert len(loaded) == len(quotes)
+    assert loaded[10:20].id.tolist() == list(range(10, 20))
+    assert loaded[-1].close == quotes[-1].close
+    chunks = list(loaded.chunks(400))
+    assert [len(chunk) for chunk in chunks] == [400, 400, 201]
+    np.testing.assert_array_equal(chunks[2].time, quotes.time[800:])
+
+
+def test_save_and_load_empty_quotes(tmp_path):
+    fpath = str(tmp_path / 'quotes.qdom')
+    save_quotes(fpath, daily_quotes(0, 0))
+    meta, columns = load_quotes(fpath)
+    assert all(len(column) == 0 for column in columns.values())
+    assert len(MappedQuotes(fpath)) == 0
+
+
+def test_wrong_quotes_files(tmp_path):
+    fpath = str(tmp_path / 'quotes.qdom')
+    with open(fpath, 'wb') as f:
+        pickle.dump(daily_quotes(0, 10), f, pickle.HIGHEST_PROTOCOL)
+    assert not is_quotes_file(fpath)
+    with pytest.raises(QuotesFileError):
+        load_quotes(fpath)
+
+    save_quotes(fpath, daily_quotes(0, 10))
+    with open(fpath, 'r+b') as f:
+        # a file of a newer version of the format
+        f.write(PREFIX.pack(MAGIC, 100, 0)[: len(MAGIC) + 2])
+    with pytest.raises(QuotesFileError):
+        load_quotes(fpath)
+
+
+def test_cache_replaces_pickled_quotes(tmp_path):
+    cache = QuotesCache(str(tmp_path))
+    fpath = cache._get_file_path('TEST', '1D')
+    # a cache file of the previous versions
+    with open(fpath, 'wb') as f:
+        pickle.dump(daily_quotes(0, 10), f, pickle.HIGHEST_PROTOCOL)
+    assert cache.ranges('TEST', '1D') == []
+
+    columns = cache.get(
+        'TEST', '1D', 0, 10 * DAY, lambda start, end: daily_quotes(0, 10)
+    )
+    assert len(columns['time']) == 10
+    assert is_quotes_file(fpath)
+    assert cache.ranges('TEST', '1D') == [[0, 10 * DAY]]
+
+
+@pytest.fixture
+def fetch():
+    """Return a loader of daily quotes recording the requested days."""
+
+    def fetch(start, end):
+        fetch.calls.append((start // DAY, end // DAY))
+        return daily_quotes(start // DAY, end // DAY)
+
+    fetch.calls = []
+    return fetch
+
+
+def get_days(cache, fetch, start, end, **kwargs):
+    columns = cache.get('TEST', '1D', start * DAY, end * DAY, fetch, **kwargs)
+    return (columns['time'] // DAY).astype(int).tolist()
+
+
+def days_ranges(cache):
+    ranges = cache.ranges('TEST', '1D')
+    return [[start // DAY, end // DAY] for start, end in ranges]
+
+
+def test_cache_ranges(tmp_path, fetch):
+    cache = QuotesCache(str(tmp_path))
+    assert get_days(cache, fetch, 0, 10) == list(range(10))
+    assert fetch.calls == [(0, 10)]
+    # inside the cached range
+    assert get_days(cache, fetch, 2, 5) == [2, 3, 4]
+    assert fetch.calls == [(0, 10)]
+
+    del fetch.calls[:]
+    # overlapping: only the missing part is fetched
+    assert get_days(cache, fetch, 5, 15) == list(range(5, 15))
+    assert fetch.calls == [(10, 15)]
+    assert days_ranges(cache) == [[0, 15]]
+
+    del fetch.calls[:]
+    # adjacent: the ranges are merged
+    assert get_days(cache, fetch, 15, 20) == list(range(15, 20))
+    assert fetch.calls == [(15, 20)]
+    assert days_ranges(cache) == [[0, 20]]
+
+    del fetch.calls[:]
+    # disjoint
+    assert get_days(cache, fetch, 30, 35) == list(range(30, 35))
+    assert fetch.calls == [(30, 35)]
+    assert days_ranges(cache) == [[0, 20], [30, 35]]
+
+    del fetch.calls[:]
+    # several gaps between and around the cached ranges
+    assert get_days(cache, fetch, 18, 40) == list(range(18, 40))
+    assert fetch.calls == [(20, 30), (35, 40)]
+    assert days_ranges(cache) == [[0, 40]]
+    assert get_days(cache, fetch, 0, 40) == list(range(40))
+    assert len(fetch.calls) == 2
+
+
+def test_cache_incomplete_ranges(tmp_path, fetch):
+    cache = QuotesCache(str(tmp_path))
+    days = get_days(cache, fetch, 0, 10, complete_before=8 * DAY)
+    assert days == list(range(10))
+    assert days_ranges(cache) == [[0, 8]]
+
+    del fetch.calls[:]
+    # the incomplete days are fetched again without duplicates
+    assert get_days(cache, fetch, 0, 12) == list(range(12))
+    assert fetch.calls == [(8, 12)]
+    assert days_ranges(cache) == [[0, 12]]
+
+
+def test_cache_without_data(tmp_path):
+    cache = QuotesCache(str(tmp_path))
+    columns = cache.get('TEST', '1D', 0, 10 * DAY, lambda start, end: None)
+    assert all(len(column) == 0 for column in columns.values())
+    assert cache.ranges('TEST', '1D') == []
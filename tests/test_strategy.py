@@ -0,0 +1,156 @@
+import numpy as np
+import pytest
+
+from quantdom.lib.engine import _compiled, run_kernel, signals_to_positions
+from quantdom.lib.portfolio import Order, Portfolio
+from quantdom.lib.strategy import AbstractStrategy, VectorizedStrategy
+
+
+def backtest(strategy):
+    Portfolio.clear()
+    strategy.run()
+    return [
+        (p.type, p.id_bar_open, p.id_bar_close, p.open_price, p.close_price)
+        for p in Portfolio.positions
+    ]
+
+
+def test_compiled_strategy(examples, make_symbol):
+    pytest.importorskip('numba')
+    symbol = make_symbol(length=1000)
+    strategy_class = examples['CompiledThreeBarStrategy']
+    quotes = Portfolio.get_quotes(symbol)
+
+    signals = run_kernel(strategy_class.kernel, quotes, (3, 3), jit=True)
+    # the kernel is compiled, not run by the interpreter after an error
+    assert _compiled[strategy_class.kernel] is not None
+    expected = run_kernel(strategy_class.kernel, quotes, (3, 3), jit=False)
+    assert signals.dtype == expected.dtype
+    assert np.array_equal(signals, expected)
+    assert np.count_nonzero(signals) > 0
+
+    compiled = strategy_class(symbols=[symbol])
+    interpreted = strategy_class(symbols=[symbol])
+    interpreted.jit = False
+    positions = backtest(compiled)
+    assert positions == backtest(interpreted)
+    # the same trades as the strategy going through the bars
+    assert positions == backtest(examples['ThreeBarStrategy'](symbols=[symbol]))
+
+
+def test_kernel_errors_are_raised(make_symbol):
+    pytest.importorskip('numba')
+    quotes = Portfolio.get_quotes(make_symbol(length=10))
+
+    def kernel(signals, time, open, high, low, close, volume):
+        for i in range(len(close)):
+            signals[i] = 1 // (i - 5)
+
+    # an error of the kernel isn't hidden by the run in the interpreter
+    with pytest.raises(ZeroDivisionError):
+        run_kernel(kernel, quotes)
+    assert _compiled[kernel] is not None
+
+
+def breakout_kernel(signals, time, open, high, low, close, volume, params):
+    n = params['window']
+    for i in range(n, close.shape[0]):
+        if close[i] > high[i - n : i].max():
+            signals[i] = 1
+        elif close[i] < (low[i - n : i] - 0.5).min():
+            signals[i] = -1
+
+
+@pytest.mark.parametrize('jit', [False, True])
+def test_kernel_with_array_methods(make_symbol, jit):
+    quotes = Portfolio.get_quotes(make_symbol(length=300))
+    # numba can't type the dict, so the kernel is run by the interpreter
+    signals = run_kernel(breakout_kernel, quotes, ({'window': 5},), jit=jit)
+    expected = np.zeros(len(quotes), dtype=np.int8)
+    for i in range(5, len(quotes)):
+        if quotes.close[i] > quotes.high[i - 5 : i].max():
+            expected[i] = 1
+        elif quotes.close[i] < quotes.low[i - 5 : i].min() - 0.5:
+            expected[i] = -1
+    assert np.count_nonzero(expected) > 0
+    np.testing.assert_array_equal(signals, expected)
+
+
+def long_short_signals(quotes):
+    """1 - long, -1 - short after the bar."""
+    return np.where(quotes.close > quotes.open, 1, -1)
+
+
+def short_only_signals(quotes):
+    """-1 - short, 0 - exit, None - no signal after the bar."""
+    body = quotes.close - quotes.open
+    return np.select([body < -0.5, body > 0.5], [-1, 0], None)
+
+
+class VectorizedSignals(VectorizedStrategy):
+    signals = staticmethod(long_short_signals)
+
+    def init(self):
+        signals = self.signals(self.quotes)
+        if (signals == 1).any():
+            self.long_entries = signals == 1
+        self.short_entries = signals == -1
+        if (signals == 0).any():
+            self.exits = signals == 0
+
+
+class BarSignals(AbstractStrategy):
+    """The same as `VectorizedSignals`, but bar by bar."""
+
+    signals = staticmethod(long_short_signals)
+
+    def init(self):
+        self.bar_signals = self.signals(self.quotes).tolist()
+        self.signal = None
+        self.direction = 0
+        self.position = None
+
+    def handle(self, bar):
+        if self.signal is not None and self.signal != self.direction:
+            # the orders of the signal are executed at the open of the bar
+            if self.position is not None:
+                Order.close(self.position, bar.open, bar.time, id_bar=bar.id)
+                self.position = None
+            if self.signal:
+                self.position = Order.open(
+                    self.symbol,
+                    Order.BUY if self.signal > 0 else Order.SELL,
+                    price=bar.open,
+                    volume=1,
+                    time=bar.time,
+                    id_bar=bar.id,
+                )
+            self.direction = self.signal
+        self.signal = self.bar_signals[bar.id]
+
+
+@pytest.mark.parametrize('signals', [long_short_signals, short_only_signals])
+def test_vectorized_strategy(make_symbol, signals):
+    symbol = make_symbol(length=500)
+    vectorized = VectorizedSignals(symbols=[symbol])
+    vectorized.signals = signals
+    bar_by_bar = BarSignals(symbols=[symbol])
+    bar_by_bar.signals = signals
+
+    positions = backtest(vectorized)
+    assert len(positions) > 10
+    if signals is short_only_signals:
+        assert vectorized.long_entries is None
+        assert {p[0] for p in positions} == {Order.SELL}
+    assert positions == backtest(bar_by_bar)
+
+
+def test_signals_to_positions():
+    entries = [False, True, False, False, True, False]
+    exits = [False, False, True, False, False, False]
+    positions = signals_to_positions(short_entries=entries, exits=exits)
+    assert positions.tolist() == [0, -1, 0, 0, -1, -1]
+    # a long entry takes precedence
+    positions = signals_to_positions(entries, entries)
+    assert positions.tolist() == [0, 1, 1, 1, 1, 1]
+    assert signals_to_positions(size=3).tolist() == [0, 0, 0]
@@ -0,0 +1,120 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from quantdom.lib.const import TimeFrame
+from quantdom.lib.ticks import BarBuilder, TickStore, read_ticks
+
+
+@pytest.fixture
+def ticks():
+    rng = np.random.RandomState(0)
+    count = 5000
+    return {
+        'time': 1_500_000_000 + np.cumsum(rng.exponential(2, count)),
+        'price': 100 + np.cumsum(rng.standard_normal(count) * 0.01),
+        'size': rng.randint(1, 100, count),
+    }
+
+
+def split(ticks, sizes):
+    """Return chunks of the ticks with the sizes (repeated)."""
+    chunks, start, i = [], 0, 0
+    while start < len(ticks['time']):
+        stop = start + sizes[i % len(sizes)]
+        chunks.append({k: v[start:stop] for k, v in ticks.items()})
+        start, i = stop, i + 1
+    return chunks
+
+
+def expected_bars(ticks, keys, times=None):
+    """Bars of the consecutive ticks with the same key, one by one."""
+    bars = []
+    for i, key in enumerate(keys):
+        price, size = ticks['price'][i], ticks['size'][i]
+        if bars and bars[-1][0] == key:
+            bar = bars[-1]
+            bar[3], bar[4] = max(bar[3], price), min(bar[4], price)
+            bar[5] = price
+            bar[6] += size
+        else:
+            time = ticks['time'][i] if times is None else times[key]
+            bars.append([key, time, price, price, price, price, size])
+    return np.array([bar[1:] for bar in bars])
+
+
+def as_array(quotes):
+    names = ('time', 'open', 'high', 'low', 'close', 'volume')
+    return np.column_stack([quotes[name] for name in names])
+
+
+@pytest.mark.parametrize('sizes', [[5000], [1], [7, 300, 1, 64]])
+def test_bar_builder(ticks, sizes):
+    cumulative = np.cumsum(ticks['size'])
+    rules = [
+        (
+            {'timeframe': TimeFrame.M5},
+            ticks['time'] // 300,
+            {key: key * 300.0 for key in np.unique(ticks['time'] // 300)},
+        ),
+        ({'ticks': 100}, np.arange(len(ticks['time'])) // 100, None),
+        ({'volume': 1000}, (cumulative - ticks['size']) // 1000, None),
+    ]
+    for kwargs, keys, times in rules:
+        builder = BarBuilder(**kwargs)
+        for chunk in split(ticks, sizes):
+            builder.update(chunk)
+        bars = builder.finish()
+        expected = expected_bars(ticks, keys, times)
+        np.testing.assert_allclose(as_array(bars), expected)
+        assert bars.id.tolist() == list(range(len(expected)))
+        assert bars.timeframe == kwargs.get('timeframe')
+    with pytest.raises(ValueError):
+        BarBuilder(ticks=10, volume=10)
+
+
+def test_tick_store(ticks, tmp_path):
+    store = TickStore(capacity=100)
+    for chunk in split(ticks, [70, 999]):
+        store.append(chunk)
+    assert len(store) == 5000
+    for name, column in ticks.items():
+        np.testing.assert_array_equal(store[name], column)
+    assert list(store.chunks(3000))[1]['price'].tolist() == (
+        ticks['price'][3000:].tolist()
+    )
+
+    fpath = str(tmp_path / 'ticks.qdom')
+    store.save(fpath)
+    loaded = TickStore.load(fpath)
+    assert isinstance(loaded['time'], np.memmap)
+    assert loaded.columns == store.columns
+    for name in store.columns:
+        assert loaded[name].dtype == store[name].dtype
+        np.testing.assert_array_equal(loaded[name], store[name])
+    np.testing.assert_array_equal(
+        as_array(loaded.bars(ticks=50)), as_array(store.bars(ticks=50))
+    )
+
+
+def test_read_ticks(ticks, tmp_path):
+    frame = pd.DataFrame(ticks)
+    frame['bid'] = frame.price - 0.01
+    frame['ask'] = frame.price + 0.01
+    frame['time'] = pd.to_datetime(frame.time, unit='s', utc=True)
+    fpath = str(tmp_path / 'ticks.csv')
+    frame.to_csv(fpath, index=False)
+
+    chunks = list(read_ticks(fpath, chunksize=1200, with_quotes=True))
+    assert [len(chunk['time']) for chunk in chunks] == [1200] * 4 + [200]
+    store = TickStore.from_csv(fpath, with_quotes=True, chunksize=1200)
+    # dates are converted to timestamps (with the precision of the csv)
+    np.testing.assert_allclose(store['time'], ticks['time'], atol=1e-6)
+    np.testing.assert_array_equal(store['size'], ticks['size'])
+    np.testing.assert_allclose(store['ask'], ticks['price'] + 0.01)
+    # without dates and quotes
+    frame['time'] = ticks['time']
+    frame.to_csv(fpath, index=False)
+    store = TickStore.from_csv(fpath)
+    assert store.columns == ('time', 'price', 'size')
+    np.testing.assert_allclose(store['time'], ticks['time'], atol=1e-6)
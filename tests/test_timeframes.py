@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from quantdom.lib.base import BaseQuotes
+from quantdom.lib.const import TimeFrame
+from quantdom.lib.timeframes import ResampleCache, completed_bars, resample
+
+
+@pytest.fixture
+def hourly():
+    rng = np.random.RandomState(0)
+    # hours of 10:00-17:00 on weekdays, from Monday 05.01.1970
+    times = [
+        day * 86400 + hour * 3600
+        for day in range(4, 100)
+        if (day + 3) % 7 < 5
+        for hour in range(10, 18)
+    ]
+    close = 100 + np.cumsum(rng.standard_normal(len(times)))
+    quotes = BaseQuotes(shape=(len(times),))
+    quotes.id = np.arange(len(times))
+    quotes.time = times
+    quotes.open = close + rng.standard_normal(len(times)) * 0.5
+    quotes.high = np.maximum(quotes.open, close) + 1
+    quotes.low = np.minimum(quotes.open, close) - 1
+    quotes.close = close
+    quotes.volume = rng.randint(1, 1000, len(times))
+    quotes.timeframe = TimeFrame.H1
+    return quotes
+
+
+def assert_quotes_equal(quotes, expected):
+    assert quotes.timeframe == expected.timeframe
+    for name in expected.dtype.names:
+        np.testing.assert_array_equal(quotes[name], expected[name])
+
+
+@pytest.mark.parametrize('timeframe', [TimeFrame.D1, TimeFrame.W1])
+def test_resample_cache(hourly, timeframe):
+    cache = ResampleCache()
+    # new bars are appended: inside the last bar, on its boundary, many
+    for stop in (5, 5, 7, 8, 9, 30, 31, 200, len(hourly)):
+        # the same bars, but another object (like after appending)
+        quotes = hourly[:stop].copy()
+        result = cache.get('TEST', quotes, timeframe)
+        assert_quotes_equal(result, resample(quotes, timeframe))
+
+    # not an extension of the cached quotes (e.g. another period)
+    quotes = hourly[40:].copy()
+    assert_quotes_equal(
+        cache.get('TEST', quotes, timeframe), resample(quotes, timeframe)
+    )
+    assert cache.get('TEST', hourly, TimeFrame.H1) is hourly
+
+
+def test_quotes_without_timeframe(hourly):
+    daily = resample(hourly, TimeFrame.D1)
+    hourly.timeframe = None
+    with pytest.raises(ValueError, match='timeframe'):
+        completed_bars(hourly, daily)
+    with pytest.raises(ValueError, match='timeframe'):
+        resample(hourly, None)